@@ -1,8 +1,14 @@
+from __future__ import annotations
 import asyncio
+from typing import TYPE_CHECKING, Awaitable, Callable
 
 import pytest
 import pytest_asyncio
 
+if TYPE_CHECKING:
+    from almatest.containers import ContainerPool
+    from almatest.postgres import TemplateDatabases
+
 
 @pytest.fixture(scope="session")
 def event_loop():
@@ -12,3 +18,34 @@ def event_loop():
 
 
 pytest_asyncio.plugin.event_loop = event_loop
+
+
+@pytest.fixture(scope="session")
+async def container_pool() -> ContainerPool:
+    # плагин грузится в каждом прогоне тестов, а testcontainers есть только на python 3.9+
+    from almatest.containers import ContainerPool
+
+    pool = ContainerPool()
+    yield pool
+    await pool.stop()
+
+
+@pytest.fixture(scope="session")
+async def template_databases() -> Callable[..., Awaitable[TemplateDatabases]]:
+    """
+    Фабрика TemplateDatabases: создает базу-шаблон в переданном postgres контейнере, в конце сессии удаляет
+    шаблон и все копии
+    """
+    from almatest.postgres import TemplateDatabases
+
+    created = []
+
+    async def create(container, setup: Callable[[str], Awaitable[None]], driver: str = "asyncpg", **kwargs):
+        databases = TemplateDatabases.from_container(container, **kwargs)
+        await databases.create_template(setup, driver)
+        created.append(databases)
+        return databases
+
+    yield create
+    for databases in created:
+        await databases.close()
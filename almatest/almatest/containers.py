@@ -1,25 +1,132 @@
+from __future__ import annotations
 import asyncio
+import atexit
+import hashlib
+import logging
 import os
 from concurrent.futures import ThreadPoolExecutor
-from typing import TypeVar
+from typing import Dict, List, Optional, TypeVar
 
 from testcontainers.core.config import testcontainers_config
 from testcontainers.core.container import DockerContainer
 from testcontainers.core.utils import inside_container
 
+logger = logging.getLogger(__name__)
+
 C = TypeVar("C", bound=DockerContainer)
 
 # ryuk невозможно поднимать в тредах, потому что код Reaper-а в testcontainers нетредсейфный
 testcontainers_config.ryuk_disabled = True
 
+REUSE_ENV = "ALMATEST_REUSE_CONTAINERS"
+POOL_KEY_LABEL = "almatest.pool.key"
+POOL_HASH_LABEL = "almatest.pool.hash"
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(thread_name_prefix="almatest")
+    return _executor
+
 
 async def start_container(container: C) -> C:
     def _start_container():
         container.start()
         return container
 
-    with ThreadPoolExecutor() as pool:
-        return await asyncio.get_running_loop().run_in_executor(pool, _start_container)
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), _start_container)
+
+
+class ContainerPool:
+    """
+    Контейнеры, нужные тестовой сессии: объявляются по ключу через add, поднимаются параллельно через start
+    и переиспользуются между модулями. С reuse=True (или ALMATEST_REUSE_CONTAINERS=1) контейнеры помечаются
+    лейблами ключа и конфигурации, находятся следующими запусками тестов и в конце не останавливаются
+    """
+
+    def __init__(self, reuse: Optional[bool] = None) -> None:
+        if reuse is None:
+            reuse = os.getenv(REUSE_ENV, "").lower() in ("1", "true", "yes")
+        self.reuse = reuse
+        self._containers: Dict[str, DockerContainer] = {}
+        self._started: Dict[str, asyncio.Future] = {}
+        # ryuk выключен, поэтому если до stop дело не дошло, контейнеры гасятся при выходе из процесса
+        atexit.register(self._stop_sync)
+
+    def add(self, key: str, container: C) -> C:
+        if key in self._containers:
+            return self._containers[key]
+        if self.reuse:
+            labels = {POOL_KEY_LABEL: key, POOL_HASH_LABEL: _config_hash(container)}
+            # with_kwargs заменил бы все kwargs контейнера, а не только лейблы
+            container._kwargs["labels"] = {**(container._kwargs.get("labels") or {}), **labels}
+        self._containers[key] = container
+        return container
+
+    def get(self, key: str) -> DockerContainer:
+        future = self._started.get(key)
+        if future is None or not future.done():
+            raise KeyError(f"container {key} is not started")
+        return future.result()
+
+    async def start(self, *keys: str) -> List[DockerContainer]:
+        keys = keys or tuple(self._containers)
+        loop = asyncio.get_running_loop()
+        for key in keys:
+            if key not in self._started:
+                self._started[key] = loop.run_in_executor(get_executor(), self._start_or_attach, key)
+        return list(await asyncio.gather(*(self._started[key] for key in keys)))
+
+    async def stop(self, force: bool = False) -> None:
+        await asyncio.get_running_loop().run_in_executor(get_executor(), self._stop_sync, force)
+
+    def _start_or_attach(self, key: str) -> DockerContainer:
+        container = self._containers[key]
+        if self.reuse:
+            existing = container.get_docker_client().client.containers.list(
+                filters={
+                    "label": [f"{POOL_KEY_LABEL}={key}", f"{POOL_HASH_LABEL}={_config_hash(container)}"],
+                    "status": "running",
+                }
+            )
+            if existing:
+                logger.info("reusing container %s for %s", existing[0].short_id, key)
+                container._container = existing[0]
+                return container
+
+        container.start()
+        return container
+
+    def _stop_sync(self, force: bool = False) -> None:
+        if self.reuse and not force:
+            return
+
+        # в обратном порядке объявления, как останавливались бы вложенные фикстуры
+        for key in reversed(list(self._started)):
+            del self._started[key]
+            # контейнер мог успеть создаться, даже если ожидание готовности упало
+            container = self._containers[key]
+            if container._container is None:
+                continue
+            try:
+                container.stop()
+            except Exception:
+                logger.exception("failed to stop container %s", key)
+
+
+def _config_hash(container: DockerContainer) -> str:
+    kwargs = {key: value for key, value in container._kwargs.items() if key != "labels"}
+    config = (
+        container.image,
+        sorted(container.env.items()),
+        sorted(container.ports.items(), key=str),
+        container._command,
+        sorted(kwargs.items(), key=str),
+    )
+    return hashlib.sha1(repr(config).encode()).hexdigest()[:16]
 
 
 class HHContainer(DockerContainer):
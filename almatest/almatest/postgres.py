@@ -0,0 +1,169 @@
+from __future__ import annotations
+import asyncio
+import logging
+import os
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Deque, List, Set
+from urllib.parse import quote
+from uuid import uuid4
+
+import psycopg2
+from psycopg2 import sql
+
+from almatest.containers import get_executor
+
+logger = logging.getLogger(__name__)
+
+
+class TemplateDatabases:
+    """
+    Схема и начальные данные создаются один раз в базе-шаблоне, а каждый тест получает свежую копию через
+    CREATE DATABASE ... TEMPLATE. Копии заранее готовятся в фоне, использованные удаляются тоже в фоне.
+    У каждого xdist воркера свой шаблон и свои копии
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: str,
+        password: str,
+        dbname: str = "postgres",
+        name: str = "almatest",
+        pool_size: int = 2,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.dbname = dbname
+        self.pool_size = pool_size
+        self.prefix = f"{name}_{os.getenv('PYTEST_XDIST_WORKER', 'main')}_"
+        self.template = f"{self.prefix}template"
+        self._ready: Deque[asyncio.Future] = deque()
+        self._pending: Set[asyncio.Future] = set()
+
+    @classmethod
+    def from_container(cls, container, **kwargs) -> TemplateDatabases:
+        # testcontainers 3 (python 3.8) и 4 называют параметры postgres по-разному
+        port = getattr(container, "port_to_expose", None) or container.port
+        return cls(
+            host=container.get_container_host_ip(),
+            port=int(container.get_exposed_port(port)),
+            user=getattr(container, "username", None) or container.POSTGRES_USER,
+            password=getattr(container, "password", None) or container.POSTGRES_PASSWORD,
+            dbname=getattr(container, "dbname", None) or container.POSTGRES_DB,
+            **kwargs,
+        )
+
+    def url(self, dbname: str, driver: str = "asyncpg") -> str:
+        credentials = f"{quote(self.user, safe='')}:{quote(self.password, safe='')}"
+        return f"postgresql+{driver}://{credentials}@{self.host}:{self.port}/{dbname}"
+
+    async def create_template(self, setup: Callable[[str], Awaitable[None]], driver: str = "asyncpg") -> None:
+        """
+        setup получает url базы-шаблона, создает в ней схему и данные и закрывает свои соединения
+        """
+        await self._run(self._drop_all_sync)
+        await self._run(self._execute_sync, sql.SQL("CREATE DATABASE {}").format(sql.Identifier(self.template)))
+        await setup(self.url(self.template, driver))
+        await self._run(self._freeze_template_sync)
+        for _ in range(self.pool_size):
+            self._prepare_clone()
+
+    async def acquire(self) -> str:
+        if not self._ready:
+            self._prepare_clone()
+        future = self._ready.popleft()
+        self._prepare_clone()
+        return await future
+
+    def release(self, dbname: str) -> None:
+        self._track(asyncio.get_running_loop().run_in_executor(get_executor(), self._drop_sync, dbname))
+
+    @asynccontextmanager
+    async def database(self, driver: str = "asyncpg") -> AsyncIterator[str]:
+        dbname = await self.acquire()
+        try:
+            yield self.url(dbname, driver)
+        finally:
+            self.release(dbname)
+
+    async def close(self) -> None:
+        self._ready.clear()
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        await self._run(self._drop_all_sync)
+
+    def _prepare_clone(self) -> None:
+        dbname = f"{self.prefix}{uuid4().hex[:12]}"
+        future = asyncio.get_running_loop().run_in_executor(get_executor(), self._clone_sync, dbname)
+        self._ready.append(future)
+        self._track(future)
+
+    def _track(self, future: asyncio.Future) -> None:
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+
+    async def _run(self, func: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(get_executor(), func, *args)
+
+    def _connect(self):
+        connection = psycopg2.connect(
+            host=self.host, port=self.port, user=self.user, password=self.password, dbname=self.dbname
+        )
+        # CREATE/DROP DATABASE нельзя выполнять в транзакции
+        connection.autocommit = True
+        return connection
+
+    def _execute_sync(self, *statements) -> List[tuple]:
+        connection = self._connect()
+        try:
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+                return cursor.fetchall() if cursor.description else []
+        finally:
+            connection.close()
+
+    def _clone_sync(self, dbname: str) -> str:
+        self._execute_sync(
+            sql.SQL("CREATE DATABASE {} TEMPLATE {}").format(sql.Identifier(dbname), sql.Identifier(self.template))
+        )
+        return dbname
+
+    def _freeze_template_sync(self) -> None:
+        # к шаблону не должно быть соединений, иначе CREATE DATABASE ... TEMPLATE упадет
+        self._execute_sync(
+            sql.SQL("ALTER DATABASE {} WITH ALLOW_CONNECTIONS false IS_TEMPLATE true").format(
+                sql.Identifier(self.template)
+            ),
+            sql.SQL("SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE datname = {}").format(
+                sql.Literal(self.template)
+            ),
+        )
+
+    def _drop_sync(self, dbname: str) -> None:
+        try:
+            self._execute_sync(
+                sql.SQL("ALTER DATABASE {} WITH ALLOW_CONNECTIONS false IS_TEMPLATE false").format(
+                    sql.Identifier(dbname)
+                ),
+                sql.SQL("SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE datname = {}").format(
+                    sql.Literal(dbname)
+                ),
+                sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(dbname)),
+            )
+        except psycopg2.Error:
+            logger.exception("failed to drop database %s", dbname)
+
+    def _drop_all_sync(self) -> None:
+        # в том числе копии, оставшиеся от упавших прошлых запусков
+        rows = self._execute_sync(
+            sql.SQL("SELECT datname FROM pg_database WHERE left(datname, {}) = {}").format(
+                sql.Literal(len(self.prefix)), sql.Literal(self.prefix)
+            )
+        )
+        for (dbname,) in rows:
+            self._drop_sync(dbname)
@@ -1,9 +1,10 @@
 import asyncio
 
+import pytest
 from testcontainers.postgres import PostgresContainer
 from testcontainers.redis import RedisContainer
 
-from almatest.containers import start_container
+from almatest.containers import ContainerPool, start_container
 
 
 async def test_run_containers():
@@ -13,3 +14,18 @@ async def test_run_containers():
     )
     for c in containers:
         c.stop()
+
+
+async def test_container_pool():
+    pool = ContainerPool(reuse=False)
+    postgres = pool.add("postgres", PostgresContainer("postgres:14.7-alpine", remove=True))
+    redis = pool.add("redis", RedisContainer("redis:7.0.3", remove=True))
+    assert pool.add("postgres", PostgresContainer("postgres:14.7-alpine")) is postgres
+
+    assert await pool.start() == [postgres, redis]
+    assert await pool.start("postgres") == [postgres]
+    assert pool.get("redis").get_client().ping()
+
+    await pool.stop()
+    with pytest.raises(KeyError):
+        pool.get("postgres")
@@ -1,14 +1,49 @@
-from datetime import datetime
+from __future__ import annotations
+import time
+from datetime import datetime, timedelta, timezone, tzinfo
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional
 
-from pytz import timezone
+from pytz import timezone as pytz_timezone, utc
 
-MSK_TIMEZONE = timezone("Europe/Moscow")
-UTC_TIMEZONE = timezone("UTC")
+MSK_TIMEZONE = pytz_timezone("Europe/Moscow")
+UTC_TIMEZONE = utc
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# вычитание datetime с одним и тем же tzinfo не вызывает utcoffset
+_EPOCHS = {timezone.utc: _EPOCH, UTC_TIMEZONE: _EPOCH.replace(tzinfo=UTC_TIMEZONE)}
+_MILLISECOND = timedelta(milliseconds=1)
+
+
+@lru_cache(maxsize=None)
+def get_zone(name: str) -> tzinfo:
+    """
+    zoneinfo зона по имени, на python 3.8 - pytz. Для них нужен localize, а не replace(tzinfo=...)
+    """
+    if name == "UTC":
+        return timezone.utc
+    try:
+        from zoneinfo import ZoneInfo
+    except ImportError:
+        return pytz_timezone(name)
+    return ZoneInfo(name)
+
+
+def localize(dt: datetime, tz: tzinfo) -> datetime:
+    localize_ = getattr(tz, "localize", None)
+    if localize_ is not None:
+        return localize_(dt)
+    return dt.replace(tzinfo=tz)
 
 
 def datetime_now(tz=UTC_TIMEZONE):
-    now = datetime.now(tz)
-    return now.replace(microsecond=(now.microsecond // 1000) * 1000)
+    """
+    Текущее время с точностью до миллисекунд, как его сохраняют get_dt_millis, kafka и база. tz=None - naive локальное
+    """
+    if tz is None:
+        now = datetime.now()
+        return now.replace(microsecond=now.microsecond // 1000 * 1000)
+    return millis_to_dt(time.time_ns() // 1_000_000, tz)
 
 
 def is_naive(dt: datetime) -> bool:
@@ -17,10 +52,50 @@ def is_naive(dt: datetime) -> bool:
 
 def as_msk(dt: datetime) -> datetime:
     if is_naive(dt):
-        dt = timezone("UTC").localize(dt)
+        dt = dt.replace(tzinfo=UTC_TIMEZONE)
 
     return dt.astimezone(MSK_TIMEZONE)
 
 
 def get_dt_millis(dt: datetime) -> int:
-    return int(dt.timestamp() * 1000)
+    if dt.tzinfo is None:
+        # как datetime.timestamp(): naive время считается локальным
+        dt = dt.astimezone()
+    # целочисленно, без погрешности float timestamp()
+    return (dt - _EPOCHS.get(dt.tzinfo, _EPOCH)) // _MILLISECOND
+
+
+def millis_to_dt(millis: int, tz: Optional[tzinfo] = UTC_TIMEZONE) -> datetime:
+    epoch = _EPOCHS.get(tz if tz is not None else timezone.utc)
+    if epoch is not None:
+        return epoch + timedelta(milliseconds=millis)
+    return (_EPOCH + timedelta(milliseconds=millis)).astimezone(tz)
+
+
+def dts_to_millis(values: Any) -> Any:
+    """
+    Список datetime в список миллисекунд. numpy массив datetime64 переводится векторно в массив int64
+    """
+    if _is_datetime64_array(values):
+        import numpy as np
+
+        return values.astype("datetime64[ms]").astype(np.int64)
+    return [None if dt is None else get_dt_millis(dt) for dt in values]
+
+
+def millis_to_dts(values: Iterable[Optional[int]], tz: Optional[tzinfo] = UTC_TIMEZONE) -> List[Optional[datetime]]:
+    if hasattr(values, "tolist"):
+        # numpy массив в python int одним проходом
+        values = values.tolist()
+    return [None if millis is None else millis_to_dt(millis, tz) for millis in values]
+
+
+def millis_to_datetime64(values: Any) -> Any:
+    import numpy as np
+
+    return np.asarray(values, dtype=np.int64).astype("datetime64[ms]")
+
+
+def _is_datetime64_array(values: Any) -> bool:
+    dtype = getattr(values, "dtype", None)
+    return dtype is not None and dtype.kind == "M"
@@ -1,10 +1,45 @@
-from typing import Callable
+from __future__ import annotations
+import asyncio
+import logging
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple
 
+import asyncpg
+from sqlalchemy import event
 from sqlalchemy.engine import url
 from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.util import await_only
 
+from ararat.serialize.common import json_deserialize as json_deserializer_obj
 from ararat.serialize.common import json_serialize as json_serializer_obj
 
+logger = logging.getLogger(__name__)
+
+ANY = "any"
+PRIMARY = "primary"
+STANDBY = "standby"
+PREFER_STANDBY = "prefer-standby"
+READ_WRITE = "read-write"
+READ_ONLY = "read-only"
+
+
+class HostState(NamedTuple):
+    in_recovery: bool
+    read_only: bool
+
+
+_TARGET_CHECKS = {
+    ANY: lambda state: True,
+    PRIMARY: lambda state: not state.in_recovery,
+    STANDBY: lambda state: state.in_recovery,
+    READ_WRITE: lambda state: not state.read_only,
+    READ_ONLY: lambda state: state.read_only,
+}
+
+# параметры подключения, которые нужны для проверки хоста
+_PROBE_CONNECT_ARGS = ("user", "password", "database", "ssl", "server_settings")
+# ошибки, после которых текущий хост больше не подходит и нужно заново выбрать хост
+_RESOLVE_AGAIN_SQLSTATES = ("25006", "57P01", "57P02", "57P03")
+
 
 def get_engine_urls(raw_url):
     parsed_url: url.URL = url.make_url(raw_url)
@@ -25,15 +60,133 @@ def get_engine_urls(raw_url):
 
 
 def get_engine(
-    raw_url, echo=False, future=True, json_serializer: Callable[[dict], str] = json_serializer_obj, **kwargs
+    raw_url,
+    echo=False,
+    future=True,
+    json_serializer: Callable[[dict], str] = json_serializer_obj,
+    json_deserializer: Callable[[str], Any] = json_deserializer_obj,
+    target_session_attrs: str = READ_WRITE,
+    probe_timeout: float = 5.0,
+    **kwargs,
 ) -> AsyncEngine:
-    for engine_url in get_engine_urls(raw_url):
+    engine_urls = [url.make_url(engine_url) for engine_url in get_engine_urls(raw_url)]
+    engine: AsyncEngine = create_async_engine(
+        engine_urls[0],
+        echo=echo,
+        future=future,
+        json_serializer=json_serializer,
+        json_deserializer=json_deserializer,
+        **kwargs,
+    )
+    if len(engine_urls) > 1:
+        hosts = [(engine_url.host, engine_url.port) for engine_url in engine_urls]
+        HostResolver(hosts, target_session_attrs, probe_timeout).attach(engine)
+    return engine
+
+
+class HostResolver:
+    """
+    Выбирает хост для подключений engine из нескольких хостов по аналогии с target_session_attrs в libpq.
+    Хосты проверяются параллельно, выбранный хост запоминается до первой ошибки подключения
+    """
+
+    def __init__(self, hosts: List[Tuple[str, int]], target_session_attrs: str = READ_WRITE, probe_timeout=5.0):
+        if target_session_attrs != PREFER_STANDBY and target_session_attrs not in _TARGET_CHECKS:
+            raise ValueError(f"Unknown target_session_attrs {target_session_attrs}")
+
+        self.hosts = hosts
+        self.target_session_attrs = target_session_attrs
+        self.probe_timeout = probe_timeout
+        self.current_host: Optional[Tuple[str, int]] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def attach(self, engine: AsyncEngine) -> None:
+        event.listen(engine.sync_engine, "do_connect", self._connect)
+        event.listen(engine.sync_engine, "handle_error", self._handle_error)
+
+    def reset(self) -> None:
+        if self.current_host is not None:
+            logger.warning("resetting database host %s:%s", *self.current_host)
+        self.current_host = None
+
+    async def resolve(self, connect_args: dict) -> Tuple[str, int]:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.current_host is None:
+                self.current_host = await self._probe_hosts(connect_args)
+                logger.info("using database host %s:%s", *self.current_host)
+            return self.current_host
+
+    async def _probe_hosts(self, connect_args: dict) -> Tuple[str, int]:
+        probe_args = {key: value for key, value in connect_args.items() if key in _PROBE_CONNECT_ARGS}
+        states = await asyncio.gather(*(self._probe(host, port, probe_args) for host, port in self.hosts))
+        host = choose_host(list(zip(self.hosts, states)), self.target_session_attrs)
+        if host is None:
+            raise ConnectionError(f"Cannot find database host with target_session_attrs={self.target_session_attrs}")
+        return host
+
+    async def _probe(self, host: str, port: int, probe_args: dict) -> Optional[HostState]:
+        # любая ошибка одного хоста (в том числе в fetchrow) не должна ронять опрос остальных
         try:
-            engine: AsyncEngine = create_async_engine(
-                engine_url, echo=echo, future=future, json_serializer=json_serializer, **kwargs
-            )
-            engine.connect()
-            return engine
+            return await asyncio.wait_for(self._fetch_state(host, port, probe_args), timeout=self.probe_timeout)
         except Exception as e:
-            exc = e
-    raise exc
+            logger.warning("database host %s:%s is unavailable: %r", host, port, e)
+            return None
+
+    async def _fetch_state(self, host: str, port: int, probe_args: dict) -> HostState:
+        connection = await asyncpg.connect(host=host, port=port, **probe_args)
+        try:
+            row = await connection.fetchrow(
+                "SELECT pg_is_in_recovery(), current_setting('transaction_read_only') = 'on'"
+            )
+            return HostState(in_recovery=row[0], read_only=row[1])
+        finally:
+            connection.terminate()
+
+    def _connect(self, dialect, conn_rec, cargs, cparams):
+        cparams["host"], cparams["port"] = await_only(self.resolve(cparams))
+        try:
+            return dialect.connect(*cargs, **cparams)
+        except Exception:
+            self.reset()
+            raise
+
+    def _handle_error(self, context) -> None:
+        if getattr(context.original_exception, "sqlstate", None) in _RESOLVE_AGAIN_SQLSTATES:
+            # хост перестал быть подходящим (например, primary стал standby), закрываем весь пул
+            context.is_disconnect = True
+        if context.is_disconnect:
+            self.reset()
+
+
+def choose_host(hosts_states: List[Tuple[Tuple[str, int], Optional[HostState]]], target_session_attrs: str):
+    if target_session_attrs == PREFER_STANDBY:
+        return choose_host(hosts_states, STANDBY) or choose_host(hosts_states, ANY)
+
+    check = _TARGET_CHECKS[target_session_attrs]
+    for host, state in hosts_states:
+        if state is not None and check(state):
+            return host
+    return None
+
+
+def get_engines(
+    raw_url,
+    echo=False,
+    future=True,
+    json_serializer: Callable[[dict], str] = json_serializer_obj,
+    json_deserializer: Callable[[str], Any] = json_deserializer_obj,
+    **kwargs,
+) -> List[AsyncEngine]:
+    return [
+        create_async_engine(
+            engine_url,
+            echo=echo,
+            future=future,
+            json_serializer=json_serializer,
+            json_deserializer=json_deserializer,
+            **kwargs,
+        )
+        for engine_url in get_engine_urls(raw_url)
+    ]
@@ -1,14 +1,24 @@
 from __future__ import annotations
 from collections import defaultdict
-from typing import Union, Collection, TypeVar, Type, Any, Tuple, List, Dict, Optional
+from typing import Union, Collection, TypeVar, Type, Any, Tuple, List, Dict, Optional, AsyncIterator, Sequence
 
-from sqlalchemy import update, delete, select
+from sqlalchemy import update, delete, select, any_, literal, inspect
+from sqlalchemy.dialects.postgresql import insert, ARRAY
 from sqlalchemy.engine import CursorResult, Result
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncResult
 from sqlalchemy.sql import Executable, Select, Update, Delete
 
+from ararat.db.loader import get_loader
+from ararat.db.keyset import keyset_directions, keyset_order_by, keyset_condition, keyset_values, decode_cursor
 from ararat.db.session import get_current_session
 
+# предел postgres на количество параметров в одном запросе
+MAX_BIND_PARAMS = 32767
+# запас на параметры самого запроса помимо значений строк (where в on_conflict и т.п.)
+BIND_PARAMS_RESERVE = 100
+IDS_CHUNK_SIZE = 10000
+
 T = TypeVar("T")
 C1 = TypeVar("C1")
 C2 = TypeVar("C2")
@@ -51,6 +61,9 @@ class BaseDao:
     async def execute(self, stmt: Executable, *args, **kwargs) -> Union[CursorResult, Result]:
         return await self._session.execute(stmt, *args, **kwargs)
 
+    async def stream(self, stmt: Executable, *args, **kwargs) -> AsyncResult:
+        return await self._session.stream(stmt, *args, **kwargs)
+
     def select(self, *args) -> Select:
         if self._options:
             return select(*args).options(*self._options)
@@ -67,6 +80,13 @@ class BaseDao:
         return delete(*args)
 
     async def get(self, entity: Type[T], ident: Any, *args, **kwargs) -> Optional[T]:
+        if not args and not kwargs and self._batch_loading_enabled():
+            column = _single_primary_key(entity)
+            if column is not None:
+                value = _scalar_ident(ident, column)
+                if value is not _NOT_SCALAR:
+                    rows = await get_loader(self._session, column).load(value)
+                    return rows[0] if rows else None
         return await self._session.get(entity, ident, *args, **kwargs)
 
     async def get_page(self, by_column, last, page_size: int, reverse: bool = True) -> List[T]:
@@ -77,15 +97,60 @@ class BaseDao:
             stmt = stmt.where((by_column < last) if reverse else (by_column > last))
         return await self.get_all(stmt)
 
-    async def get_by_ids(self, column: C1, ids: Collection[C1], preserve_order=False) -> List[T]:
-        if not ids:
-            return []
-        stmt = self.select(column.parent).filter(column.in_(ids))
+    async def get_keyset_page(
+        self,
+        by_columns: Sequence,
+        last: Union[str, Sequence[Any], None],
+        page_size: int,
+        reverse: Union[bool, Sequence[bool]] = True,
+    ) -> List[T]:
+        reverse = keyset_directions(by_columns, reverse)
+        stmt = self.select(by_columns[0].parent).order_by(*keyset_order_by(by_columns, reverse)).limit(page_size)
         if self._criteria:
             stmt = stmt.where(*self._criteria)
-        if self._order_by:
-            stmt = stmt.order_by(*self._order_by)
-        result = await self.get_all(stmt)
+        if isinstance(last, str):
+            last = decode_cursor(last, by_columns)
+        if last:
+            stmt = stmt.where(keyset_condition(by_columns, reverse, last))
+        return await self.get_all(stmt)
+
+    async def iter_keyset_pages(
+        self,
+        by_columns: Sequence,
+        page_size: int,
+        reverse: Union[bool, Sequence[bool]] = True,
+        last: Union[str, Sequence[Any], None] = None,
+    ) -> AsyncIterator[List[T]]:
+        while True:
+            page = await self.get_keyset_page(by_columns, last, page_size, reverse)
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            last = keyset_values(page[-1], by_columns)
+
+    async def get_by_ids(
+        self,
+        column: C1,
+        ids: Collection[C1],
+        preserve_order=False,
+        chunk_size: int = IDS_CHUNK_SIZE,
+        use_any: bool = False,
+    ) -> List[T]:
+        if not ids:
+            return []
+        if self._batch_loading_enabled():
+            loaded = await get_loader(self._session, column).load_many(ids)
+            result = [item for items in loaded.values() for item in items]
+        else:
+            unique_ids = list(dict.fromkeys(ids))
+            if self._order_by:
+                # order_by внутри пачек не дал бы общего порядка, а массив - один параметр, его не нужно делить
+                chunk_size, use_any = len(unique_ids), True
+            result = []
+            for start in range(0, len(unique_ids), chunk_size):
+                chunk = unique_ids[start : start + chunk_size]
+                result.extend(await self.get_all(self._get_by_ids_stmt(column, chunk, use_any)))
         if not preserve_order or len(result) <= 1:
             return result
 
@@ -93,11 +158,18 @@ class BaseDao:
         return [item for id_ in ids if (item := mapping.get(id_)) is not None]
 
     async def get_map_by_ids(
-        self, *, column: C1, ids: Collection[C1], map_column: C2 = None, reduce=True
+        self,
+        *,
+        column: C1,
+        ids: Collection[C1],
+        map_column: C2 = None,
+        reduce=True,
+        chunk_size: int = IDS_CHUNK_SIZE,
+        use_any: bool = False,
     ) -> Dict[Union[C2, C1], T]:
         if not ids:
             return {}
-        result = await self.get_by_ids(column, ids)
+        result = await self.get_by_ids(column, ids, chunk_size=chunk_size, use_any=use_any)
         if map_column is None:
             map_column = column
         if reduce:
@@ -118,6 +190,39 @@ class BaseDao:
         await self._session.flush()
         return items
 
+    async def insert_many(
+        self, entity: Type[T], values: Sequence[Dict[str, Any]], returning: Sequence = (), use_copy: bool = False
+    ) -> List[Any]:
+        if not values:
+            return []
+        if use_copy and not returning:
+            await self._copy_many(entity, values)
+            return []
+        return await self._insert_batches(insert(entity), values, returning)
+
+    async def upsert_many(
+        self,
+        entity: Type[T],
+        values: Sequence[Dict[str, Any]],
+        index_elements: Sequence,
+        update_columns: Optional[Sequence[str]] = None,
+        returning: Sequence = (),
+    ) -> List[Any]:
+        if not values:
+            return []
+        if update_columns is None:
+            index_keys = {element if isinstance(element, str) else element.key for element in index_elements}
+            update_columns = [key for key in values[0] if key not in index_keys]
+
+        stmt = insert(entity)
+        if update_columns:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=index_elements, set_={key: stmt.excluded[key] for key in update_columns}
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+        return await self._insert_batches(stmt, values, returning)
+
     async def get_first(self, stmt) -> Union[Any, Tuple[Any, ...]]:
         result = await self.execute(stmt)
         result = self._configure_result(result, stmt)
@@ -137,13 +242,131 @@ class BaseDao:
         result = self._configure_result(result, stmt)
         return result.all()
 
+    async def stream_all(self, stmt, yield_per: int = 1000) -> AsyncIterator[Union[Any, Tuple[Any, ...]]]:
+        result = await self._stream_yield_per(stmt, yield_per)
+        try:
+            async for item in result:
+                yield item
+        finally:
+            # при выходе из async for раньше времени результат иначе закрылся бы только при сборке генератора
+            await result.close()
+
+    async def stream_chunks(
+        self, stmt, chunk_size: int = 1000
+    ) -> AsyncIterator[Union[List[Any], List[Tuple[Any, ...]]]]:
+        result = await self._stream_yield_per(stmt, chunk_size)
+        try:
+            async for chunk in result.partitions():
+                yield chunk
+        finally:
+            await result.close()
+
+    async def _stream_yield_per(self, stmt, yield_per: int) -> AsyncResult:
+        try:
+            result = await self.stream(stmt.execution_options(yield_per=yield_per))
+        except InvalidRequestError as e:
+            if "yield_per" not in str(e):
+                raise
+            # joinedload коллекций требует unique() по всему результату, что несовместимо с yield_per
+            raise InvalidRequestError(
+                "stream_all/stream_chunks can't be used with joinedload() of collections, use selectinload() instead"
+            ) from e
+        if len(stmt.column_descriptions) == 1:
+            result = result.scalars()
+        return result
+
     async def get_rows_count(self, stmt) -> int:
         result = await self.execute(stmt)
         return result.rowcount
 
+    async def _insert_batches(self, stmt, values: Sequence[Dict[str, Any]], returning: Sequence) -> List[Any]:
+        if returning:
+            stmt = stmt.returning(*returning)
+
+        batch_size = max(1, (MAX_BIND_PARAMS - BIND_PARAMS_RESERVE) // _params_per_row(stmt.table, values))
+        returned = []
+        for start in range(0, len(values), batch_size):
+            result = await self.execute(stmt.values(values[start : start + batch_size]))
+            if not returning:
+                continue
+            returned.extend(result.scalars().all() if len(returning) == 1 else result.all())
+        return returned
+
+    async def _copy_many(self, entity: Type[T], values: Sequence[Dict[str, Any]]) -> None:
+        table = entity.__table__
+        connection = await self._session.connection()
+        keys = list(values[0])
+        columns = [table.columns[key] for key in keys]
+        processors = [column.type.bind_processor(connection.dialect) for column in columns]
+        records = [
+            tuple(item[key] if processor is None else processor(item[key]) for key, processor in zip(keys, processors))
+            for item in values
+        ]
+
+        raw_connection = await connection.get_raw_connection()
+        adapted = raw_connection.dbapi_connection
+        # адаптер sqlalchemy открывает транзакцию asyncpg лениво, на первом execute. Без этого COPY первым
+        # запросом в Session.begin() выполнился бы в autocommit и не откатывался бы вместе с сессией
+        async with adapted._execute_mutex:
+            try:
+                if not adapted._started:
+                    await adapted._start_transaction()
+                await adapted.driver_connection.copy_records_to_table(
+                    table.name, records=records, columns=[column.name for column in columns], schema_name=table.schema
+                )
+            except Exception as error:
+                adapted._handle_exception(error)
+
+    def _batch_loading_enabled(self) -> bool:
+        if self._options or self._criteria or self._order_by:
+            return False
+        return getattr(self._session, "batch_loading", False)
+
+    def _get_by_ids_stmt(self, column, ids: List[Any], use_any: bool) -> Select:
+        if use_any:
+            # один параметр-массив вместо IN (...) сохраняет форму запроса для кэша prepared statements
+            condition = column == any_(literal(ids, ARRAY(column.type)))
+        else:
+            condition = column.in_(ids)
+        stmt = self.select(column.parent).filter(condition)
+        if self._criteria:
+            stmt = stmt.where(*self._criteria)
+        if self._order_by:
+            stmt = stmt.order_by(*self._order_by)
+        return stmt
+
     def _configure_result(self, result, stmt):
-        if result.raw.context.compiled.compile_state.multi_row_eager_loaders:
+        raw_result = result._real_result if isinstance(result, AsyncResult) else result
+        if raw_result.raw.context.compiled.compile_state.multi_row_eager_loaders:
             result = result.unique()
         if len(stmt.column_descriptions) == 1:
             result = result.scalars()
         return result
+
+
+_NOT_SCALAR = object()
+
+
+def _scalar_ident(ident: Any, column) -> Any:
+    # session.get принимает и кортеж, и словарь по имени атрибута
+    if isinstance(ident, (tuple, list)):
+        return ident[0] if len(ident) == 1 else _NOT_SCALAR
+    if isinstance(ident, dict):
+        return ident[column.key] if len(ident) == 1 and column.key in ident else _NOT_SCALAR
+    return ident
+
+
+def _single_primary_key(entity):
+    mapper = inspect(entity)
+    if len(mapper.primary_key) != 1:
+        return None
+    return getattr(entity, mapper.get_property_by_column(mapper.primary_key[0]).key)
+
+
+def _params_per_row(table, values: Sequence[Dict[str, Any]]) -> int:
+    # строки могут иметь разные ключи, а для колонок с default sqlalchemy добавляет параметры сама
+    keys = {key for row in values for key in row}
+    keys.update(
+        column.key for column in table.columns if column.default is not None or column.server_default is not None
+    )
+    return max(1, len(keys))
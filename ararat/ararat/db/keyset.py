@@ -0,0 +1,97 @@
+from __future__ import annotations
+import base64
+import binascii
+import json
+from datetime import datetime, date
+from decimal import Decimal
+from typing import Any, Sequence, Tuple, List, Union
+from uuid import UUID
+
+from sqlalchemy import and_, or_, tuple_
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def keyset_directions(by_columns: Sequence, reverse: Union[bool, Sequence[bool]]) -> Tuple[bool, ...]:
+    if isinstance(reverse, bool):
+        return (reverse,) * len(by_columns)
+    if len(reverse) != len(by_columns):
+        raise ValueError("reverse must be specified for every column")
+    return tuple(reverse)
+
+
+def keyset_order_by(by_columns: Sequence, reverse: Sequence[bool]) -> List[Any]:
+    return [column.desc() if desc else column.asc() for column, desc in zip(by_columns, reverse)]
+
+
+def keyset_condition(by_columns: Sequence, reverse: Sequence[bool], last: Sequence[Any]):
+    if len(last) != len(by_columns):
+        raise ValueError("last must contain a value for every column")
+
+    if len(set(reverse)) == 1:
+        if len(by_columns) == 1:
+            left, right = by_columns[0], last[0]
+        else:
+            left, right = tuple_(*by_columns), tuple(last)
+        return (left < right) if reverse[0] else (left > right)
+
+    # сравнение кортежей (a, b) > (x, y) не поддерживает разные направления сортировки, раскрываем его вручную
+    clauses = []
+    for i, (column, desc) in enumerate(zip(by_columns, reverse)):
+        equals = [by_columns[j] == last[j] for j in range(i)]
+        clauses.append(and_(*equals, (column < last[i]) if desc else (column > last[i])))
+    return or_(*clauses)
+
+
+def keyset_values(item: Any, by_columns: Sequence) -> Tuple[Any, ...]:
+    return tuple(getattr(item, column.key) for column in by_columns)
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(list(values), default=_cursor_value_serializer, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(token: str, by_columns: Sequence) -> Tuple[Any, ...]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError) as e:
+        raise InvalidCursor(f"Cannot decode cursor {token!r}") from e
+
+    if not isinstance(values, list) or len(values) != len(by_columns):
+        raise InvalidCursor(f"Cursor {token!r} doesn't match columns")
+
+    try:
+        return tuple(_restore_value(value, column) for value, column in zip(values, by_columns))
+    except (TypeError, ValueError) as e:
+        raise InvalidCursor(f"Cannot decode cursor {token!r}") from e
+
+
+def _cursor_value_serializer(value: Any) -> str:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    raise TypeError(f"Cannot serialize {value} into cursor")
+
+
+def _restore_value(value: Any, column) -> Any:
+    if value is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type is UUID:
+        return UUID(value)
+    if python_type is Decimal:
+        return Decimal(value)
+    return value
@@ -0,0 +1,106 @@
+from __future__ import annotations
+import asyncio
+from collections import defaultdict
+from typing import Any, Collection, Dict, List, Set
+
+from sqlalchemy import any_, event, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+_LOADERS_KEY = "ararat.loaders"
+_LOADERS_LOCK_KEY = "ararat.loaders_lock"
+
+
+class IdsLoader:
+    """
+    Собирает все запросы по id, сделанные за одну итерацию event loop, в один select
+    и кэширует найденные строки до конца сессии
+    """
+
+    def __init__(self, session: AsyncSession, column, lock: asyncio.Lock) -> None:
+        self._session = session
+        self._column = column
+        self._lock = lock
+        self._cache: Dict[Any, List[Any]] = {}
+        self._pending: Dict[Any, asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def load(self, id_: Any) -> List[Any]:
+        return (await self.load_many([id_]))[id_]
+
+    async def load_many(self, ids: Collection[Any]) -> Dict[Any, List[Any]]:
+        result = {id_: self._cache.get(id_) for id_ in ids}
+        waiting = {id_: self._get_future(id_) for id_, rows in result.items() if rows is None}
+        if waiting:
+            # future общие с другими вызовами, отмена одного из них не должна отменять остальные
+            rows = await asyncio.gather(*(asyncio.shield(future) for future in waiting.values()))
+            # берем результат из future, а не из кэша: его мог очистить flush, пока мы ждали
+            result.update(zip(waiting, rows))
+        return result
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def _get_future(self, id_: Any) -> asyncio.Future:
+        future = self._pending.get(id_)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        if not self._pending:
+            loop.call_soon(self._dispatch)
+        future = self._pending[id_] = loop.create_future()
+        return future
+
+    def _dispatch(self) -> None:
+        batch, self._pending = self._pending, {}
+        task = asyncio.ensure_future(self._load_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _load_batch(self, batch: Dict[Any, asyncio.Future]) -> None:
+        try:
+            async with self._lock:
+                ids_param = literal(list(batch), ARRAY(self._column.type))
+                stmt = select(self._column.parent).where(self._column == any_(ids_param))
+                rows = (await self._session.execute(stmt)).scalars().all()
+        except BaseException as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        found = defaultdict(list)
+        for row in rows:
+            found[getattr(row, self._column.key)].append(row)
+        for id_, future in batch.items():
+            rows = self._cache[id_] = found.get(id_, [])
+            if not future.done():
+                future.set_result(rows)
+
+
+def get_loader(session: AsyncSession, column) -> IdsLoader:
+    loaders = session.info.get(_LOADERS_KEY)
+    if loaders is None:
+        loaders = session.info[_LOADERS_KEY] = {}
+        session.info[_LOADERS_LOCK_KEY] = asyncio.Lock()
+        _listen_for_changes(session, loaders)
+
+    loader = loaders.get(column)
+    if loader is None:
+        loader = loaders[column] = IdsLoader(session, column, session.info[_LOADERS_LOCK_KEY])
+    return loader
+
+
+def _listen_for_changes(session: AsyncSession, loaders: Dict[Any, IdsLoader]) -> None:
+    def clear_loaders(*args) -> None:
+        for loader in loaders.values():
+            loader.clear()
+
+    def clear_loaders_on_dml(orm_execute_state) -> None:
+        if not orm_execute_state.is_select:
+            clear_loaders()
+
+    event.listen(session.sync_session, "after_flush", clear_loaders)
+    event.listen(session.sync_session, "after_rollback", clear_loaders)
+    event.listen(session.sync_session, "do_orm_execute", clear_loaders_on_dml)
@@ -0,0 +1,175 @@
+from __future__ import annotations
+import hashlib
+import logging
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+logger = logging.getLogger(__name__)
+
+Tags = Optional[Dict[str, str]]
+
+
+class MetricsSink(ABC):
+    """
+    Точка расширения для отправки метрик во внешние системы (statsd, prometheus и т.п.)
+    """
+
+    @abstractmethod
+    def timing(self, name: str, value: float, tags: Tags = None) -> None:
+        pass
+
+    @abstractmethod
+    def increment(self, name: str, value: int = 1, tags: Tags = None) -> None:
+        pass
+
+    @abstractmethod
+    def gauge(self, name: str, value: float, tags: Tags = None) -> None:
+        pass
+
+
+class InMemorySink(MetricsSink):
+    def __init__(self) -> None:
+        self.timings: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], List[float]] = defaultdict(list)
+        self.counters: Counter = Counter()
+        self.gauges: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+
+    def timing(self, name: str, value: float, tags: Tags = None) -> None:
+        self.timings[_metric_key(name, tags)].append(value)
+
+    def increment(self, name: str, value: int = 1, tags: Tags = None) -> None:
+        self.counters[_metric_key(name, tags)] += value
+
+    def gauge(self, name: str, value: float, tags: Tags = None) -> None:
+        self.gauges[_metric_key(name, tags)] = value
+
+    def get_timings(self, name: str) -> List[float]:
+        return [value for (metric, _), values in self.timings.items() if metric == name for value in values]
+
+    def get_counter(self, name: str) -> int:
+        return sum(value for (metric, _), value in self.counters.items() if metric == name)
+
+
+class DbInstrumentation:
+    def __init__(
+        self,
+        sink: MetricsSink,
+        slow_query_threshold: Optional[float] = 1.0,
+        prefix: str = "db",
+        max_logged_statement_length: int = 1000,
+    ) -> None:
+        self.sink = sink
+        self.slow_query_threshold = slow_query_threshold
+        self.prefix = prefix
+        self.max_logged_statement_length = max_logged_statement_length
+
+    def instrument(self, engine: AsyncEngine, name: str = "primary") -> None:
+        tags = {"engine": name}
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            context._ararat_query_start = time.perf_counter()
+
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            self._on_query(statement, time.perf_counter() - context._ararat_query_start, tags)
+
+        def handle_error(context):
+            self.sink.increment(f"{self.prefix}.query.errors", tags=tags)
+
+        sync_engine = engine.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", after_cursor_execute)
+        event.listen(sync_engine, "handle_error", handle_error)
+        if isinstance(sync_engine.pool, InstrumentedAsyncQueuePool):
+            sync_engine.pool.instrumentation_tags = tags
+
+    def on_checkout(self, pool: InstrumentedAsyncQueuePool, duration: float, overflow_created: bool) -> None:
+        tags = pool.instrumentation_tags
+        self.sink.timing(f"{self.prefix}.pool.checkout", duration, tags=tags)
+        self.sink.gauge(f"{self.prefix}.pool.checked_out", pool.checkedout(), tags=tags)
+        if overflow_created:
+            self.sink.increment(f"{self.prefix}.pool.overflow", tags=tags)
+
+    def on_checkout_timeout(self, pool: InstrumentedAsyncQueuePool, duration: float) -> None:
+        self.sink.increment(f"{self.prefix}.pool.timeout", tags=pool.instrumentation_tags)
+
+    def _on_query(self, statement: str, duration: float, tags: Dict[str, str]) -> None:
+        fingerprint = statement_fingerprint(statement)
+        self.sink.timing(f"{self.prefix}.query", duration, tags={**tags, "fingerprint": fingerprint})
+        if self.slow_query_threshold is not None and duration >= self.slow_query_threshold:
+            self.sink.increment(f"{self.prefix}.query.slow", tags={**tags, "fingerprint": fingerprint})
+            logger.warning(
+                "slow query %.3fs [%s]: %s", duration, fingerprint, statement[: self.max_logged_statement_length]
+            )
+
+
+class StatementCacheStats:
+    def __init__(self, instrumentation: Optional[DbInstrumentation] = None) -> None:
+        self.instrumentation = instrumentation
+        self.executions = 0
+        self.prepares = 0
+
+    @property
+    def hit_rate(self) -> float:
+        if not self.executions:
+            return 0.0
+        return max(0.0, 1 - self.prepares / self.executions)
+
+    def instrument(self, engine: AsyncEngine) -> None:
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def on_prepare(self) -> None:
+        self.prepares += 1
+        if self.instrumentation is not None:
+            self.instrumentation.sink.increment(f"{self.instrumentation.prefix}.statement_cache.miss")
+
+    def _on_execute(self, *args) -> None:
+        self.executions += 1
+        if self.instrumentation is not None:
+            self.instrumentation.sink.increment(f"{self.instrumentation.prefix}.statement_cache.lookup")
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    def __init__(self, creator, instrumentation: Optional[DbInstrumentation] = None, **kw):
+        super().__init__(creator, **kw)
+        self.instrumentation = instrumentation
+        self.instrumentation_tags: Dict[str, str] = {}
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.instrumentation = self.instrumentation
+        pool.instrumentation_tags = self.instrumentation_tags
+        return pool
+
+    def connect(self):
+        if self.instrumentation is None:
+            return super().connect()
+
+        overflow = self.overflow()
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.instrumentation.on_checkout_timeout(self, time.perf_counter() - start)
+            raise
+        self.instrumentation.on_checkout(self, time.perf_counter() - start, self.overflow() > max(overflow, 0))
+        return connection
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def statement_fingerprint(statement: str) -> str:
+    normalized = _WHITESPACE_RE.sub(" ", statement).strip()
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def _metric_key(name: str, tags: Tags) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    return name, tuple(sorted(tags.items())) if tags else ()
@@ -0,0 +1,72 @@
+from __future__ import annotations
+import itertools
+import logging
+import time
+from functools import partial
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+ROUND_ROBIN = "round_robin"
+LEAST_CONNECTIONS = "least_connections"
+
+
+class EngineRouter:
+    """
+    Распределяет сессии между несколькими engine (например, репликами)
+    и временно исключает из выбора хосты, к которым не удается подключиться
+    """
+
+    def __init__(self, engines: List[AsyncEngine], balancing: str = ROUND_ROBIN, ejection_time: float = 30.0):
+        if balancing not in (ROUND_ROBIN, LEAST_CONNECTIONS):
+            raise ValueError(f"Unknown balancing strategy {balancing}")
+
+        self.engines = engines
+        self.balancing = balancing
+        self.ejection_time = ejection_time
+        self._counter = itertools.count()
+        self._ejected_until: Dict[AsyncEngine, float] = {}
+
+        for engine in engines:
+            event.listen(engine.sync_engine, "do_connect", partial(self._connect, engine))
+            event.listen(engine.sync_engine, "handle_error", partial(self._handle_error, engine))
+
+    def choose(self) -> Optional[AsyncEngine]:
+        engines = self.healthy_engines()
+        if not engines:
+            return None
+        if self.balancing == LEAST_CONNECTIONS:
+            return min(engines, key=lambda engine: engine.sync_engine.pool.checkedout())
+        return engines[next(self._counter) % len(engines)]
+
+    def healthy_engines(self) -> List[AsyncEngine]:
+        if not self._ejected_until:
+            return self.engines
+
+        now = time.monotonic()
+        for engine, ejected_until in list(self._ejected_until.items()):
+            if ejected_until <= now:
+                del self._ejected_until[engine]
+        return [engine for engine in self.engines if engine not in self._ejected_until]
+
+    def eject(self, engine: AsyncEngine) -> None:
+        logger.warning("ejecting %s for %s seconds", engine.url.render_as_string(), self.ejection_time)
+        self._ejected_until[engine] = time.monotonic() + self.ejection_time
+
+    async def dispose(self) -> None:
+        for engine in self.engines:
+            await engine.dispose()
+
+    def _connect(self, engine: AsyncEngine, dialect, conn_rec, cargs, cparams):
+        try:
+            return dialect.connect(*cargs, **cparams)
+        except Exception:
+            self.eject(engine)
+            raise
+
+    def _handle_error(self, engine: AsyncEngine, context) -> None:
+        if context.is_disconnect:
+            self.eject(engine)
@@ -1,5 +1,7 @@
 from __future__ import annotations
 import asyncio
+import hashlib
+import itertools
 from contextvars import ContextVar
 from functools import wraps
 from typing import Callable, TypeVar
@@ -12,7 +14,9 @@ from sqlalchemy.ext.asyncio.session import _AsyncSessionContextManager
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.util import await_only
 
-from ararat.db.connection import get_engine
+from ararat.db.connection import get_engine, get_engines
+from ararat.db.metrics import DbInstrumentation, InstrumentedAsyncQueuePool, StatementCacheStats
+from ararat.db.routing import EngineRouter, ROUND_ROBIN
 
 _current_session_var: ContextVar["ArAsyncSession"] = ContextVar("_current_session")
 
@@ -42,42 +46,137 @@ def get_current_session(allow_missing=False) -> AsyncSession | None:
 
 C = TypeVar("C", bound=Callable)
 
+# уникальные имена prepared statements, безопасно для pgbouncer
+PGBOUNCER = "pgbouncer"
+# имена prepared statements по хэшу запроса, для прямого подключения к postgres
+DIRECT = "direct"
 
-class UniqIdConnection(Connection):
+
+class StatsConnection(Connection):
+    statement_cache_stats: StatementCacheStats | None = None
+
+    async def _get_statement(self, query, timeout, *, named=False, **kwargs):
+        # sqlalchemy вызывает prepare (named=True) только при промахе мимо своего кэша prepared statements
+        if named is True:
+            if self.statement_cache_stats is not None:
+                self.statement_cache_stats.on_prepare()
+            named = self._get_statement_name(query)
+        return await super()._get_statement(query, timeout, named=named, **kwargs)
+
+    def _get_statement_name(self, query: str) -> bool | str:
+        return True
+
+
+class UniqIdConnection(StatsConnection):
     def _get_unique_id(self, prefix: str) -> str:
         return f"__asyncpg_{prefix}_{uuid4()}__"
 
 
+class HashedIdConnection(StatsConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._statement_counter = itertools.count()
+
+    def _get_statement_name(self, query: str) -> bool | str:
+        digest = hashlib.sha1(query.encode()).hexdigest()[:20]
+        # вытесненный из кэша statement закрывается на сервере не сразу, поэтому повторная подготовка того же запроса
+        # должна получить новое имя. Счетчик общий на соединение: словарь по запросам рос бы без ограничений
+        return f"__asyncpg_stmt_{digest}_{next(self._statement_counter)}__"
+
+
+_CONNECTION_CLASSES = {PGBOUNCER: UniqIdConnection, DIRECT: HashedIdConnection}
+
+
 class SessionMaker(sessionmaker):
     def __init__(
-        self, db_url: str | None = None, hide_parameters: bool = True, connect_args: dict = None, **engine_kwargs
+        self,
+        db_url: str | None = None,
+        hide_parameters: bool = True,
+        connect_args: dict = None,
+        batch_loading: bool = False,
+        replica_db_url: str | None = None,
+        replica_balancing: str = ROUND_ROBIN,
+        replica_ejection_time: float = 30.0,
+        instrumentation: DbInstrumentation | None = None,
+        statement_cache: str = PGBOUNCER,
+        statement_cache_size: int | None = None,
+        **engine_kwargs,
     ):
         self.engine: AsyncEngine | None = None
+        self.replicas: EngineRouter | None = None
         self.session_maker: sessionmaker | None = None
         self.db_url: str = db_url
+        self.replica_db_url: str | None = replica_db_url
         self.hide_parameters = hide_parameters
         self.connect_args = connect_args
+        self.batch_loading = batch_loading
+        self.replica_balancing = replica_balancing
+        self.replica_ejection_time = replica_ejection_time
+        self.instrumentation = instrumentation
+        if statement_cache not in _CONNECTION_CLASSES:
+            raise ValueError(f"Unknown statement cache mode {statement_cache}")
+        self.statement_cache = statement_cache
+        self.statement_cache_size = statement_cache_size
+        self.statement_cache_stats = StatementCacheStats(instrumentation)
         self.engine_kwargs = engine_kwargs
 
-    def initialize(self, db_url: str | None = None, **engine_kwargs):
+    def initialize(self, db_url: str | None = None, replica_db_url: str | None = None, **engine_kwargs):
         if not db_url:
             db_url = self.db_url
+        if not replica_db_url:
+            replica_db_url = self.replica_db_url
         kwargs = {"connect_args": self.connect_args or {}, **self.engine_kwargs, **engine_kwargs}
 
         connect_args = kwargs["connect_args"]
         if "connection_class" not in connect_args:
-            connect_args["connection_class"] = UniqIdConnection
+            connection_class = _CONNECTION_CLASSES[self.statement_cache]
+            connect_args["connection_class"] = type(
+                connection_class.__name__, (connection_class,), {"statement_cache_stats": self.statement_cache_stats}
+            )
+        if self.statement_cache_size is not None:
+            connect_args["prepared_statement_cache_size"] = self.statement_cache_size
+        if self.instrumentation is not None and "poolclass" not in kwargs:
+            kwargs["poolclass"] = InstrumentedAsyncQueuePool
+            kwargs["instrumentation"] = self.instrumentation
 
         self.engine: AsyncEngine = get_engine(db_url, hide_parameters=self.hide_parameters, **kwargs)
-        self.session_maker = sessionmaker(self.engine, class_=ArAsyncSession, expire_on_commit=False, autoflush=False)
+        if replica_db_url:
+            self.replicas = EngineRouter(
+                get_engines(replica_db_url, hide_parameters=self.hide_parameters, **kwargs),
+                balancing=self.replica_balancing,
+                ejection_time=self.replica_ejection_time,
+            )
+
+        engines = [self.engine] + (self.replicas.engines if self.replicas is not None else [])
+        for engine in engines:
+            self.statement_cache_stats.instrument(engine)
+        if self.instrumentation is not None:
+            self.instrumentation.instrument(self.engine)
+            for replica in engines[1:]:
+                self.instrumentation.instrument(replica, name="replica")
+        self.session_maker = sessionmaker(
+            self.engine,
+            class_=ArAsyncSession,
+            expire_on_commit=False,
+            autoflush=False,
+            batch_loading=self.batch_loading,
+        )
 
     async def close(self):
         await self.engine.dispose()
-
-    def begin(self):
-        return self.session_maker.begin()
-
-    def __call__(self, **local_kw):
+        if self.replicas is not None:
+            await self.replicas.dispose()
+
+    def begin(self, readonly: bool = False):
+        if not readonly:
+            return self.session_maker.begin()
+        return self(readonly=True)._maker_context_manager()
+
+    def __call__(self, readonly: bool = False, **local_kw):
+        if readonly and "bind" not in local_kw:
+            replica = self.replicas.choose() if self.replicas is not None else None
+            if replica is not None:
+                local_kw["bind"] = replica
         return self.session_maker.__call__(**local_kw)
 
     def configure(self, **new_kw):
@@ -86,13 +185,13 @@ class SessionMaker(sessionmaker):
     def __repr__(self):
         return self.session_maker.__repr__()
 
-    def transactional(self):
+    def transactional(self, readonly: bool = False):
         def dec(func: C) -> C:
             @wraps(func)
             async def wrapper(*args, **kwargs):
                 session = get_current_session(allow_missing=True)
                 if session is None:
-                    async with self.session_maker.begin():
+                    async with self.begin(readonly=readonly):
                         return await func(*args, **kwargs)
                 return await func(*args, **kwargs)
 
@@ -100,13 +199,13 @@ class SessionMaker(sessionmaker):
 
         return dec
 
-    def with_session(self):
+    def with_session(self, readonly: bool = False):
         def dec(func: C) -> C:
             @wraps(func)
             async def wrapper(*args, **kwargs):
                 session = get_current_session(allow_missing=True)
                 if session is None:
-                    async with self.session_maker():
+                    async with self(readonly=readonly):
                         return await func(*args, **kwargs)
                 return await func(*args, **kwargs)
 
@@ -116,6 +215,10 @@ class SessionMaker(sessionmaker):
 
 
 class ArAsyncSession(AsyncSession):
+    def __init__(self, *args, batch_loading: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batch_loading = batch_loading
+
     def run_after_commit(self, hook: Callable, *args, **kwargs):
         event.listens_for(self.sync_session, "after_commit")(lambda session: await_only(hook(*args, **kwargs)))
 
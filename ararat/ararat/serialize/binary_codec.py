@@ -0,0 +1,97 @@
+from __future__ import annotations
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Optional, Union
+
+import pytz
+
+from .json_codec import default_serializer, get_codec
+
+# 0xc1 не используется в msgpack и не может начинать json (и вообще utf-8 текст),
+# поэтому по первому байту можно отличить бинарный формат от json во время миграции
+MSGPACK_TAG = b"\xc1"
+
+DATETIME_EXT_TYPE = 1
+DATE_EXT_TYPE = 2
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class MsgpackCodec:
+    name = "msgpack"
+
+    def __init__(self) -> None:
+        import msgpack
+
+        self._msgpack = msgpack
+
+    def dumps(self, value: Any) -> bytes:
+        return MSGPACK_TAG + self._msgpack.packb(value, default=self._encode_ext, datetime=False)
+
+    def loads(self, data: bytes) -> Any:
+        if data[:1] != MSGPACK_TAG:
+            raise ValueError("Data is not tagged as msgpack")
+        return self._msgpack.unpackb(memoryview(data)[1:], ext_hook=self._decode_ext, strict_map_key=False)
+
+    def _encode_ext(self, obj: Any) -> Any:
+        if isinstance(obj, datetime):
+            return self._msgpack.ExtType(DATETIME_EXT_TYPE, self._msgpack.packb(_datetime_to_tuple(obj)))
+        if isinstance(obj, date):
+            return self._msgpack.ExtType(DATE_EXT_TYPE, self._msgpack.packb(obj.toordinal()))
+        if hasattr(obj, "model_dump"):
+            return obj.model_dump()
+        return default_serializer(obj)
+
+    def _decode_ext(self, code: int, data: bytes) -> Any:
+        if code == DATETIME_EXT_TYPE:
+            return _datetime_from_tuple(*self._msgpack.unpackb(data))
+        if code == DATE_EXT_TYPE:
+            return date.fromordinal(self._msgpack.unpackb(data))
+        return self._msgpack.ExtType(code, data)
+
+
+def _datetime_to_tuple(dt: datetime) -> list:
+    tzinfo = dt.tzinfo
+    if tzinfo is None or tzinfo.utcoffset(dt) is None:
+        delta = dt - _EPOCH
+        return [delta.days * 86400 + delta.seconds, delta.microseconds, None]
+
+    # имя зоны (pytz, zoneinfo) сохраняет переходы на летнее время, для остальных tzinfo сохраняем смещение
+    zone_name = getattr(tzinfo, "zone", None) or getattr(tzinfo, "key", None)
+    delta = dt.replace(tzinfo=None) - dt.utcoffset() - _EPOCH
+    tz = zone_name if zone_name is not None else int(dt.utcoffset().total_seconds())
+    return [delta.days * 86400 + delta.seconds, delta.microseconds, tz]
+
+
+def _datetime_from_tuple(seconds: int, microseconds: int, tz: Optional[Union[str, int]]) -> datetime:
+    utc = _EPOCH + timedelta(seconds=seconds, microseconds=microseconds)
+    if tz is None:
+        return utc
+    tzinfo = pytz.timezone(tz) if isinstance(tz, str) else timezone(timedelta(seconds=tz))
+    return utc.replace(tzinfo=pytz.UTC).astimezone(tzinfo)
+
+
+_codec: Optional[MsgpackCodec] = None
+
+
+def get_binary_codec() -> MsgpackCodec:
+    global _codec
+    if _codec is None:
+        _codec = MsgpackCodec()
+    return _codec
+
+
+def is_binary(data: Union[str, bytes]) -> bool:
+    return isinstance(data, (bytes, bytearray, memoryview)) and data[:1] == MSGPACK_TAG
+
+
+def binary_serialize(value: Any) -> bytes:
+    return get_binary_codec().dumps(value)
+
+
+def deserialize(data: Union[str, bytes]) -> Any:
+    """
+    Разбирает и бинарный формат, и json, определяя формат по первому байту
+    """
+    if is_binary(data):
+        return get_binary_codec().loads(data)
+    return get_codec().loads(data)
@@ -1,5 +1,8 @@
-import json
+from __future__ import annotations
 from datetime import datetime
+from typing import Any, Union
+
+from .json_codec import get_codec
 
 
 def date_serializer(obj):
@@ -9,4 +12,12 @@ def date_serializer(obj):
 
 
 def json_serialize(value: dict) -> str:
-    return json.dumps(value, default=date_serializer)
+    return get_codec().dumps_str(value)
+
+
+def json_serialize_bytes(value) -> bytes:
+    return get_codec().dumps(value)
+
+
+def json_deserialize(data: Union[str, bytes]) -> Any:
+    return get_codec().loads(data)
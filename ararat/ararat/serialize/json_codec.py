@@ -0,0 +1,135 @@
+from __future__ import annotations
+import json
+from abc import ABC, abstractmethod
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Dict, Optional, Union
+from uuid import UUID
+
+ORJSON = "orjson"
+MSGSPEC = "msgspec"
+STDLIB = "json"
+
+
+def default_serializer(obj: Any) -> Any:
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, (UUID, Decimal)):
+        return str(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    # pydantic v2 / v1
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json")
+    if hasattr(obj, "__fields__") and hasattr(obj, "dict"):
+        return obj.dict()
+    raise TypeError(f"Cannot serialize {obj}")
+
+
+class JsonCodec(ABC):
+    name: str
+
+    @abstractmethod
+    def dumps(self, value: Any) -> bytes:
+        pass
+
+    def dumps_str(self, value: Any) -> str:
+        return self.dumps(value).decode()
+
+    @abstractmethod
+    def loads(self, data: Union[str, bytes]) -> Any:
+        pass
+
+
+class StdlibJsonCodec(JsonCodec):
+    name = STDLIB
+
+    def dumps(self, value: Any) -> bytes:
+        return self.dumps_str(value).encode()
+
+    def dumps_str(self, value: Any) -> str:
+        return json.dumps(value, default=default_serializer)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    name = ORJSON
+
+    def __init__(self) -> None:
+        import orjson
+
+        self._dumps = orjson.dumps
+        self._option = orjson.OPT_NON_STR_KEYS
+        self._loads = orjson.loads
+        self._encode_error = orjson.JSONEncodeError
+
+    def dumps(self, value: Any) -> bytes:
+        try:
+            return self._dumps(value, default=default_serializer, option=self._option)
+        except self._encode_error:
+            # например, целые больше 64 бит: stdlib их сериализует
+            return get_codec(STDLIB).dumps(value)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return self._loads(data)
+
+
+class MsgspecCodec(JsonCodec):
+    name = MSGSPEC
+
+    def __init__(self) -> None:
+        import msgspec
+
+        self._encoder = msgspec.json.Encoder(enc_hook=default_serializer)
+        self._decode = msgspec.json.Decoder().decode
+
+    def dumps(self, value: Any) -> bytes:
+        return self._encoder.encode(value)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return self._decode(data)
+
+
+_codec_factories: Dict[str, Callable[[], JsonCodec]] = {
+    ORJSON: OrjsonCodec,
+    MSGSPEC: MsgspecCodec,
+    STDLIB: StdlibJsonCodec,
+}
+_codecs: Dict[str, JsonCodec] = {}
+_default_codec: Optional[JsonCodec] = None
+
+
+def register_codec(name: str, factory: Callable[[], JsonCodec]) -> None:
+    global _default_codec
+    _codec_factories[name] = factory
+    _codecs.pop(name, None)
+    _default_codec = None
+
+
+def get_codec(name: Optional[str] = None) -> JsonCodec:
+    if name is None:
+        return _get_default_codec()
+
+    codec = _codecs.get(name)
+    if codec is None:
+        codec = _codecs[name] = _codec_factories[name]()
+    return codec
+
+
+def set_default_codec(name: Optional[str]) -> None:
+    """
+    Фиксирует кодек по умолчанию, None возвращает stdlib json. orjson и msgspec быстрее, но на части входов
+    ведут себя иначе (NaN сериализуют в null, смещения pytz LMT пишут по-другому), поэтому включаются явно
+    """
+    global _default_codec
+    _default_codec = None if name is None else get_codec(name)
+
+
+def _get_default_codec() -> JsonCodec:
+    global _default_codec
+    if _default_codec is None:
+        _default_codec = get_codec(STDLIB)
+    return _default_codec
@@ -1,5 +1,169 @@
-from .common import json_serialize
+from __future__ import annotations
+import gzip
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .binary_codec import binary_serialize, deserialize, get_binary_codec, is_binary
+from .common import json_serialize_bytes
+from .json_codec import get_codec
+
+GZIP = "gzip"
+LZ4 = "lz4"
+ZSTD = "zstd"
+
+SCHEMA_VERSION_HEADER = "schema-version"
+CONTENT_ENCODING_HEADER = "content-encoding"
+_CODEC_HEADERS = frozenset((SCHEMA_VERSION_HEADER, CONTENT_ENCODING_HEADER))
+
+Headers = List[Tuple[str, Optional[bytes]]]
+
+
+class SchemaVersionError(ValueError):
+    pass
 
 
 def kafka_json_serialize(value) -> bytes:
-    return json_serialize(value).encode()
+    return json_serialize_bytes(value)
+
+
+def kafka_binary_serialize(value) -> bytes:
+    return binary_serialize(value)
+
+
+def kafka_deserialize(value: bytes) -> Any:
+    return deserialize(value)
+
+
+def _gzip_compressor() -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    return lambda data: gzip.compress(data, compresslevel=6), gzip.decompress
+
+
+def _lz4_compressor() -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    import lz4.frame
+
+    return lz4.frame.compress, lz4.frame.decompress
+
+
+def _zstd_compressor() -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    import zstandard
+
+    return zstandard.ZstdCompressor().compress, zstandard.ZstdDecompressor().decompress
+
+
+_compressors = {GZIP: _gzip_compressor, LZ4: _lz4_compressor, ZSTD: _zstd_compressor}
+
+
+def get_compressor(name: str) -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    if name not in _compressors:
+        raise ValueError(f"Unknown compression {name}")
+    return _compressors[name]()
+
+
+class KafkaBatchCodec:
+    """
+    Сериализует и десериализует сообщения пачками: кодек, сжатие и модель выбираются один раз на пачку,
+    а большие пачки делятся на чанки и обрабатываются в executor (например, ProcessPoolExecutor)
+    """
+
+    def __init__(
+        self,
+        model: Optional[type] = None,
+        compression: Optional[str] = None,
+        schema_version: Optional[str] = None,
+        executor: Optional[Executor] = None,
+        parallel_threshold: int = 5000,
+        chunk_size: int = 1000,
+        binary: bool = False,
+    ) -> None:
+        if compression is not None:
+            get_compressor(compression)
+        self.model = model
+        self.compression = compression
+        self.schema_version = schema_version
+        self.executor = executor
+        self.parallel_threshold = parallel_threshold
+        self.chunk_size = chunk_size
+        self.binary = binary
+
+    @property
+    def headers(self) -> Headers:
+        headers = []
+        if self.schema_version is not None:
+            headers.append((SCHEMA_VERSION_HEADER, self.schema_version.encode()))
+        if self.compression is not None:
+            headers.append((CONTENT_ENCODING_HEADER, self.compression.encode()))
+        return headers
+
+    def serialize_many(self, values: Sequence[Any]) -> List[bytes]:
+        return self._run(_serialize_chunk, values, self.compression, self.binary)
+
+    def deserialize_many(self, payloads: Sequence[bytes], headers: Optional[Headers] = None) -> List[Any]:
+        compression = self._check_headers(headers) if headers is not None else self.compression
+        return self._run(_deserialize_chunk, payloads, compression, self.model)
+
+    def serialize_batch(self, values: Sequence[Any]) -> bytes:
+        """
+        Упаковывает всю пачку в одно сообщение, сжатие применяется к пачке целиком
+        """
+        return _serialize_chunk([values], self.compression, self.binary)[0]
+
+    def deserialize_batch(self, payload: bytes, headers: Optional[Headers] = None) -> List[Any]:
+        compression = self._check_headers(headers) if headers is not None else self.compression
+        values = _deserialize_chunk([payload], compression)[0]
+        if self.model is None:
+            return values
+        return _validate(self.model, values)
+
+    def _check_headers(self, headers: Headers) -> Optional[str]:
+        # декодируются только свои заголовки: чужие могут быть бинарными. Заголовок без значения считается отсутствующим
+        headers_dict = {key: value.decode() for key, value in headers if value and key in _CODEC_HEADERS}
+        schema_version = headers_dict.get(SCHEMA_VERSION_HEADER)
+        if self.schema_version is not None and schema_version != self.schema_version:
+            raise SchemaVersionError(f"Expected schema version {self.schema_version}, got {schema_version}")
+        return headers_dict.get(CONTENT_ENCODING_HEADER)
+
+    def _run(self, func: Callable[..., List[Any]], items: Sequence[Any], *args) -> List[Any]:
+        if self.executor is None or len(items) < self.parallel_threshold:
+            return func(items, *args)
+
+        chunks = [items[i : i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+        futures = [self.executor.submit(func, chunk, *args) for chunk in chunks]
+        result = []
+        for future in futures:
+            result.extend(future.result())
+        return result
+
+
+def _serialize_chunk(values: Sequence[Any], compression: Optional[str], binary: bool = False) -> List[bytes]:
+    dumps = get_binary_codec().dumps if binary else get_codec().dumps
+    if compression is None:
+        return [dumps(value) for value in values]
+    compress, _ = get_compressor(compression)
+    return [compress(dumps(value)) for value in values]
+
+
+def _deserialize_chunk(
+    payloads: Sequence[bytes], compression: Optional[str], model: Optional[type] = None
+) -> List[Any]:
+    if compression is not None:
+        _, decompress = get_compressor(compression)
+        payloads = [decompress(payload) for payload in payloads]
+
+    # во время миграции в одной пачке могут быть и json, и бинарные сообщения
+    if any(is_binary(payload) for payload in payloads):
+        values = [deserialize(payload) for payload in payloads]
+        return values if model is None else _validate(model, values)
+
+    loads = get_codec().loads
+    if model is None:
+        return [loads(payload) for payload in payloads]
+    # pydantic v2 валидирует прямо из байтов
+    validate_json: Optional[Callable[[bytes], Any]] = getattr(model, "model_validate_json", None)
+    if validate_json is not None:
+        return [validate_json(payload) for payload in payloads]
+    return _validate(model, [loads(payload) for payload in payloads])
+
+
+def _validate(model: type, values: List[Dict[str, Any]]) -> List[Any]:
+    validate = getattr(model, "model_validate", None) or model.parse_obj
+    return [validate(value) for value in values]
@@ -4,8 +4,19 @@ from typing import Type
 
 from pydantic import BaseModel
 
+from .binary_codec import deserialize, is_binary
+
 T = typing.TypeVar("T", bound=BaseModel)
 
 
 def pydantic_deserializer(model: type[T]) -> typing.Callable[str | bytes, T]:
-    return lambda value: model.parse_raw(value)
+    # pydantic v2 валидирует json сразу из байтов, без промежуточного dict
+    validate_json = getattr(model, "model_validate_json", None)
+    validate = getattr(model, "model_validate", None) or model.parse_obj
+
+    def deserializer(value: str | bytes) -> T:
+        if validate_json is not None and not is_binary(value):
+            return validate_json(value)
+        return validate(deserialize(value))
+
+    return deserializer
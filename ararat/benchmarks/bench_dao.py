@@ -0,0 +1,277 @@
+"""
+Нагрузочный прогон BaseDao и SessionMaker на локальном postgres: операции dao по числу затрагиваемых строк
+и накладные расходы сессий по уровням конкурентности. Результат - по одной json строке на замер
+
+    PYTHONPATH=. python benchmarks/bench_dao.py --db-url postgresql+asyncpg://postgres@127.0.0.1/postgres \
+        [--rows 10 100 1000] [--concurrency 1 8 32] [--number 200] [--output results.jsonl]
+
+Таблицы bench_dao_* создаются заново при каждом запуске и удаляются в конце
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List
+
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Text, select, text
+from sqlalchemy.orm import declarative_base, joinedload, relationship
+
+from ararat.db.dao import BaseDao
+from ararat.db.session import SessionMaker
+
+DEFAULT_DB_URL = "postgresql+asyncpg://postgres@127.0.0.1:5432/postgres"
+CHILDREN_PER_ITEM = 3
+
+Base = declarative_base()
+
+
+class BenchItem(Base):
+    __tablename__ = "bench_dao_item"
+    id: int = Column(BigInteger(), primary_key=True)
+    creation_time: datetime = Column(DateTime(True), nullable=False)
+    value: str = Column(Text())
+    children = relationship("BenchChild", lazy="raise", back_populates="item")
+
+
+class BenchChild(Base):
+    __tablename__ = "bench_dao_child"
+    id: int = Column(BigInteger(), primary_key=True)
+    item_id: int = Column(BigInteger(), ForeignKey("bench_dao_item.id"), nullable=False)
+    value: str = Column(Text())
+    item = relationship("BenchItem", lazy="raise", back_populates="children")
+
+
+Operation = Callable[[], Awaitable]
+
+
+async def prepare(session_maker: SessionMaker, table_rows: int) -> None:
+    async with session_maker.engine.begin() as con:
+        await con.run_sync(Base.metadata.drop_all)
+        await con.run_sync(Base.metadata.create_all)
+
+    now = datetime.now(timezone.utc)
+    async with session_maker.begin():
+        await BaseDao().insert_many(
+            BenchItem,
+            [{"id": i, "creation_time": now, "value": f"item {i}"} for i in range(1, table_rows + 1)],
+            use_copy=True,
+        )
+        await BaseDao().insert_many(
+            BenchChild,
+            [
+                {"id": i * CHILDREN_PER_ITEM + j, "item_id": i, "value": f"child {j}"}
+                for i in range(1, table_rows + 1)
+                for j in range(CHILDREN_PER_ITEM)
+            ],
+            use_copy=True,
+        )
+    async with session_maker.engine.begin() as con:
+        # id засеяны явно, add_all должен продолжать с конца
+        await con.execute(
+            text(f"SELECT setval(pg_get_serial_sequence('{BenchItem.__tablename__}', 'id'), {table_rows})")
+        )
+        await con.execute(text(f"ANALYZE {BenchItem.__tablename__}, {BenchChild.__tablename__}"))
+
+
+def dao_operations(session_maker: SessionMaker, rows: int, table_rows: int) -> Dict[str, Operation]:
+    def random_ids() -> List[int]:
+        return random.sample(range(1, table_rows + 1), rows)
+
+    async def get():
+        async with session_maker():
+            for id_ in random_ids():
+                await BaseDao().get(BenchItem, id_)
+
+    async def get_by_ids():
+        async with session_maker():
+            await BaseDao().get_by_ids(BenchItem.id, random_ids())
+
+    async def get_by_ids_preserve_order():
+        async with session_maker():
+            await BaseDao().get_by_ids(BenchItem.id, random_ids(), preserve_order=True)
+
+    async def get_page():
+        async with session_maker():
+            await BaseDao().get_page(BenchItem.id, random.randint(rows, table_rows), rows)
+
+    async def get_first_joinedload():
+        async with session_maker():
+            dao = BaseDao()
+            for id_ in random_ids():
+                await dao.get_first(
+                    select(BenchItem).options(joinedload(BenchItem.children)).where(BenchItem.id == id_)
+                )
+
+    async def get_all_joinedload():
+        # joinedload коллекции, результат проходит через unique()
+        last = random.randint(0, table_rows - rows)
+        async with session_maker():
+            await BaseDao().get_all(
+                select(BenchItem)
+                .options(joinedload(BenchItem.children))
+                .where(BenchItem.id > last)
+                .order_by(BenchItem.id)
+                .limit(rows)
+            )
+
+    async def get_all_joinedload_many_to_one():
+        last = random.randint(0, table_rows * CHILDREN_PER_ITEM - rows)
+        async with session_maker():
+            await BaseDao().get_all(
+                select(BenchChild)
+                .options(joinedload(BenchChild.item))
+                .where(BenchChild.id > last)
+                .order_by(BenchChild.id)
+                .limit(rows)
+            )
+
+    async def add_all():
+        now = datetime.now(timezone.utc)
+        async with session_maker.begin():
+            await BaseDao().add_all([BenchItem(creation_time=now, value="added") for _ in range(rows)])
+
+    return {
+        "get": get,
+        "get_by_ids": get_by_ids,
+        "get_by_ids_preserve_order": get_by_ids_preserve_order,
+        "get_page": get_page,
+        "get_first_joinedload": get_first_joinedload,
+        "get_all_joinedload_unique": get_all_joinedload,
+        "get_all_joinedload": get_all_joinedload_many_to_one,
+        # пишет в таблицу, поэтому идет последним
+        "add_all": add_all,
+    }
+
+
+def session_operations(session_maker: SessionMaker) -> Dict[str, Operation]:
+    @session_maker.transactional()
+    async def transactional():
+        pass
+
+    @session_maker.transactional(readonly=True)
+    async def transactional_readonly():
+        pass
+
+    @session_maker.with_session()
+    async def with_session():
+        pass
+
+    @session_maker.transactional()
+    async def transactional_select_1():
+        await BaseDao().execute(text("SELECT 1"))
+
+    async def engine_select_1():
+        # нижняя граница: тот же запрос без orm сессии
+        async with session_maker.engine.connect() as con:
+            await con.execute(text("SELECT 1"))
+
+    return {
+        "transactional": transactional,
+        "transactional_readonly": transactional_readonly,
+        "with_session": with_session,
+        "transactional_select_1": transactional_select_1,
+        "engine_select_1": engine_select_1,
+    }
+
+
+async def measure(operation: Operation, number: int, concurrency: int) -> dict:
+    for _ in range(min(number, 10)):
+        await operation()
+
+    latencies: List[float] = []
+    per_worker = max(1, number // concurrency)
+
+    async def worker():
+        for _ in range(per_worker):
+            start = time.perf_counter()
+            await operation()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    total = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "ops": len(latencies),
+        "total_s": round(total, 6),
+        "ops_per_s": round(len(latencies) / total, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1e3, 4),
+        "p50_ms": round(_percentile(latencies, 0.5) * 1e3, 4),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1e3, 4),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1e3, 4),
+    }
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def emit(record: dict, output) -> None:
+    output.write(json.dumps(record) + "\n")
+    output.flush()
+    print(
+        f"{record['scenario']:<28} rows={str(record['rows']):<6} concurrency={record['concurrency']:<4}"
+        f" {record['ops_per_s']:>10.1f} ops/s  p50 {record['p50_ms']:8.3f} ms  p99 {record['p99_ms']:8.3f} ms",
+        file=sys.stderr,
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db-url", default=os.environ.get("ARARAT_BENCH_DB_URL", DEFAULT_DB_URL))
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--table-rows", type=int, default=20000)
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--scenario", nargs="*", help="run only these scenarios")
+    parser.add_argument("--output", help="jsonl file for results, stdout by default")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    if max(args.rows) > args.table_rows:
+        parser.error("--rows must not exceed --table-rows")
+
+    max_concurrency = max(args.concurrency)
+    session_maker = SessionMaker(args.db_url, pool_size=max_concurrency, max_overflow=0)
+    session_maker.initialize()
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        await prepare(session_maker, args.table_rows)
+        common = {"table_rows": args.table_rows, "python": sys.version.split()[0]}
+
+        def selected(scenario: str) -> bool:
+            return not args.scenario or scenario in args.scenario
+
+        for scenario, operation in session_operations(session_maker).items():
+            if not selected(scenario):
+                continue
+            for concurrency in args.concurrency:
+                result = await measure(operation, args.number, concurrency)
+                emit({"scenario": scenario, "rows": None, "concurrency": concurrency, **result, **common}, output)
+
+        for rows in args.rows:
+            for scenario, operation in dao_operations(session_maker, rows, args.table_rows).items():
+                if not selected(scenario):
+                    continue
+                for concurrency in args.concurrency:
+                    result = await measure(operation, args.number, concurrency)
+                    emit({"scenario": scenario, "rows": rows, "concurrency": concurrency, **result, **common}, output)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        async with session_maker.engine.begin() as con:
+            await con.run_sync(Base.metadata.drop_all)
+        await session_maker.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""
+ararat.common.dt против прежних реализаций: datetime_now, as_msk, get_dt_millis и пакетные конверсии
+
+    PYTHONPATH=. python benchmarks/bench_dt.py [--rows 10000] [--number 20]
+"""
+
+from __future__ import annotations
+import argparse
+import timeit
+from datetime import datetime, timedelta
+
+from pytz import timezone as pytz_timezone
+
+from ararat.common.dt import (
+    MSK_TIMEZONE,
+    UTC_TIMEZONE,
+    as_msk,
+    datetime_now,
+    dts_to_millis,
+    get_dt_millis,
+    get_zone,
+    is_naive,
+    millis_to_dt,
+    millis_to_dts,
+)
+
+
+def legacy_datetime_now(tz=UTC_TIMEZONE):
+    now = datetime.now(tz)
+    return now.replace(microsecond=(now.microsecond // 1000) * 1000)
+
+
+def legacy_as_msk(dt: datetime) -> datetime:
+    if is_naive(dt):
+        dt = pytz_timezone("UTC").localize(dt)
+    return dt.astimezone(MSK_TIMEZONE)
+
+
+def legacy_get_dt_millis(dt: datetime) -> int:
+    return int(dt.timestamp() * 1000)
+
+
+def legacy_millis_to_dt(millis: int, tz=UTC_TIMEZONE) -> datetime:
+    return datetime.fromtimestamp(millis / 1000, tz)
+
+
+def report(name: str, number: int, func, per: int = 1) -> None:
+    best = min(timeit.repeat(func, number=number, repeat=5)) / number / per
+    print(f"{name:<40} {best * 1e6:10.3f} us")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    single = args.number * 1000
+    naive = datetime(2024, 5, 6, 7, 8, 9, 123456)
+    aware = naive.replace(tzinfo=UTC_TIMEZONE)
+    msk_zone = get_zone("Europe/Moscow")
+
+    report("legacy datetime_now", single, legacy_datetime_now)
+    report("datetime_now", single, datetime_now)
+    report("legacy datetime_now(MSK)", single, lambda: legacy_datetime_now(MSK_TIMEZONE))
+    report("datetime_now(MSK)", single, lambda: datetime_now(MSK_TIMEZONE))
+    report("datetime_now(zoneinfo MSK)", single, lambda: datetime_now(msk_zone))
+    report("legacy as_msk(naive)", single, lambda: legacy_as_msk(naive))
+    report("as_msk(naive)", single, lambda: as_msk(naive))
+    report("astimezone(zoneinfo MSK)", single, lambda: aware.astimezone(msk_zone))
+    report("legacy get_dt_millis", single, lambda: legacy_get_dt_millis(aware))
+    report("get_dt_millis", single, lambda: get_dt_millis(aware))
+    report("legacy fromtimestamp(millis / 1000)", single, lambda: legacy_millis_to_dt(1714979289123))
+    report("millis_to_dt", single, lambda: millis_to_dt(1714979289123))
+
+    dts = [aware + timedelta(seconds=i) for i in range(args.rows)]
+    millis = [legacy_get_dt_millis(dt) for dt in dts]
+    print(f"batch of {args.rows}, per row:")
+    report("legacy [get_dt_millis]", args.number, lambda: [legacy_get_dt_millis(dt) for dt in dts], args.rows)
+    report("dts_to_millis", args.number, lambda: dts_to_millis(dts), args.rows)
+    report("legacy [fromtimestamp]", args.number, lambda: [legacy_millis_to_dt(m) for m in millis], args.rows)
+    report("millis_to_dts", args.number, lambda: millis_to_dts(millis), args.rows)
+    report("millis_to_dts(zoneinfo MSK)", args.number, lambda: millis_to_dts(millis, msk_zone), args.rows)
+
+    try:
+        import numpy as np
+    except ImportError:
+        print(f"{'numpy':<40} not installed")
+        return
+
+    from ararat.common.dt import millis_to_datetime64
+
+    array = np.array(millis, dtype=np.int64).astype("datetime64[ms]")
+    report("dts_to_millis(datetime64 array)", args.number, lambda: dts_to_millis(array), args.rows)
+    report("millis_to_datetime64", args.number, lambda: millis_to_datetime64(millis), args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Сравнение скорости json кодеков на документе, похожем на большой JSONB
+
+    PYTHONPATH=. python benchmarks/bench_serialize.py [--items 1000] [--number 50]
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import timeit
+from datetime import datetime
+from typing import List
+
+from pydantic import BaseModel
+
+from ararat.serialize.binary_codec import get_binary_codec
+from ararat.serialize.json_codec import get_codec, MSGSPEC, ORJSON, STDLIB
+
+
+class Item(BaseModel):
+    id: int
+    name: str
+    price: float
+    tags: List[str]
+    created: datetime
+
+
+class Document(BaseModel):
+    items: List[Item]
+
+
+def make_document(items: int) -> dict:
+    return {
+        "items": [
+            {
+                "id": i,
+                "name": f"item {i}",
+                "price": i * 1.5,
+                "tags": ["a", "b", "в"],
+                "created": "2024-01-02T03:04:05.006000+03:00",
+            }
+            for i in range(items)
+        ]
+    }
+
+
+def report(name: str, number: int, func) -> None:
+    best = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"{name:<40} {best * 1000:10.3f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--number", type=int, default=50)
+    args = parser.parse_args()
+
+    document = make_document(args.items)
+    raw = json.dumps(document).encode()
+    print(f"document size: {len(raw)} bytes")
+
+    for name in (STDLIB, ORJSON, MSGSPEC):
+        try:
+            codec = get_codec(name)
+        except ImportError:
+            print(f"{name:<40} not installed")
+            continue
+        report(f"{name} dumps", args.number, lambda: codec.dumps(document))
+        # sqlalchemy отдает в json_deserializer уже декодированную строку
+        report(f"{name} loads(bytes.decode())", args.number, lambda: codec.loads(raw.decode()))
+
+    try:
+        binary_codec = get_binary_codec()
+        binary = binary_codec.dumps(document)
+        print(f"msgpack size: {len(binary)} bytes")
+        report("msgpack dumps", args.number, lambda: binary_codec.dumps(document))
+        report("msgpack loads", args.number, lambda: binary_codec.loads(binary))
+    except ImportError:
+        print(f"{'msgpack':<40} not installed")
+
+    report("pydantic parse_raw", args.number, lambda: Document.parse_raw(raw))
+    codec = get_codec()
+    report(f"pydantic parse_obj({codec.name}.loads)", args.number, lambda: Document.parse_obj(codec.loads(raw)))
+    if hasattr(Document, "model_validate_json"):
+        report("pydantic model_validate_json", args.number, lambda: Document.model_validate_json(raw))
+
+
+if __name__ == "__main__":
+    main()
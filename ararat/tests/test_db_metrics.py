@@ -0,0 +1,99 @@
+import asyncio
+import hashlib
+import logging
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError
+from testcontainers.postgres import PostgresContainer
+
+from ararat.db.dao import BaseDao
+from ararat.db.metrics import DbInstrumentation, InMemorySink, statement_fingerprint
+from ararat.db.session import SessionMaker
+
+
+def _db_url(pg_container: PostgresContainer) -> str:
+    db_port = pg_container.get_exposed_port(pg_container.port_to_expose)
+    return (
+        f"postgresql+asyncpg://{pg_container.get_container_host_ip()}:{db_port}/{pg_container.POSTGRES_DB}?"
+        f"user={pg_container.POSTGRES_USER}&password={pg_container.POSTGRES_PASSWORD}"
+    )
+
+
+def test_statement_fingerprint():
+    assert statement_fingerprint("SELECT 1\n  FROM t") == statement_fingerprint("SELECT 1 FROM t")
+    assert statement_fingerprint("SELECT 1 FROM t") != statement_fingerprint("SELECT 2 FROM t")
+
+
+async def test_query_and_pool_metrics(pg_container: PostgresContainer, caplog):
+    sink = InMemorySink()
+    session_maker = SessionMaker(
+        instrumentation=DbInstrumentation(sink, slow_query_threshold=0.05),
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.1,
+    )
+    session_maker.initialize(_db_url(pg_container))
+
+    async def select(query):
+        async with session_maker() as session:
+            await BaseDao(session).execute(text(query))
+
+    try:
+        with caplog.at_level(logging.WARNING, logger="ararat.db.metrics"):
+            await select("SELECT 1")
+            await select("SELECT pg_sleep(0.1)")
+
+        query_timings = sink.get_timings("db.query")
+        assert len(query_timings) >= 2
+        assert sink.get_counter("db.query.slow") == 1
+        assert "SELECT pg_sleep(0.1)" in caplog.text
+        assert ("db.query", (("engine", "primary"), ("fingerprint", statement_fingerprint("SELECT 1")))) in sink.timings
+        assert len(sink.get_timings("db.pool.checkout")) >= 2
+        assert sink.get_counter("db.pool.overflow") == 0
+
+        await asyncio.gather(select("SELECT pg_sleep(0.05)"), select("SELECT pg_sleep(0.05)"))
+        assert sink.get_counter("db.pool.overflow") == 1
+
+        with pytest.raises(TimeoutError):
+            await asyncio.gather(*(select("SELECT pg_sleep(0.3)") for _ in range(3)))
+        assert sink.get_counter("db.pool.timeout") == 1
+    finally:
+        await session_maker.close()
+
+
+@pytest.mark.parametrize("statement_cache", ["pgbouncer", "direct"])
+async def test_statement_cache(pg_container: PostgresContainer, statement_cache):
+    sink = InMemorySink()
+    session_maker = SessionMaker(
+        instrumentation=DbInstrumentation(sink),
+        statement_cache=statement_cache,
+        statement_cache_size=2,
+        pool_size=1,
+    )
+    session_maker.initialize(_db_url(pg_container))
+    stats = session_maker.statement_cache_stats
+
+    try:
+        async with session_maker() as session:
+            for _ in range(5):
+                for query in ("SELECT 1", "SELECT 2", "SELECT 1", "SELECT 3"):
+                    await session.execute(text(query))
+
+            statements = (await session.execute(text("SELECT name FROM pg_prepared_statements"))).scalars().all()
+            if statement_cache == "direct":
+                assert any(
+                    name.startswith(f"__asyncpg_stmt_{hashlib.sha1(b'SELECT 2').hexdigest()[:20]}")
+                    for name in statements
+                )
+
+        assert stats.executions == 21
+        assert 0 < stats.prepares < stats.executions
+        assert stats.hit_rate == 1 - stats.prepares / stats.executions
+        assert sink.get_counter("db.statement_cache.miss") == stats.prepares
+        assert sink.get_counter("db.statement_cache.lookup") == stats.executions
+    finally:
+        await session_maker.close()
+
+    with pytest.raises(ValueError):
+        SessionMaker(statement_cache="unknown")
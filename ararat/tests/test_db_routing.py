@@ -0,0 +1,144 @@
+import asyncpg
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import create_async_engine
+from testcontainers.postgres import PostgresContainer
+
+from ararat.db.connection import choose_host, get_engine, HostResolver, HostState, READ_WRITE
+from ararat.db.dao import BaseDao
+from ararat.db.routing import EngineRouter, LEAST_CONNECTIONS
+from ararat.db.session import SessionMaker
+
+
+def test_round_robin_and_ejection():
+    engines = [create_async_engine(f"postgresql+asyncpg://user@127.0.0.1:{port}/db") for port in (5001, 5002, 5003)]
+    router = EngineRouter(engines)
+    assert [router.choose() for _ in range(4)] == [engines[0], engines[1], engines[2], engines[0]]
+
+    router.eject(engines[1])
+    assert router.healthy_engines() == [engines[0], engines[2]]
+
+    router.eject(engines[0])
+    router.eject(engines[2])
+    assert router.choose() is None
+
+    router.ejection_time = 0
+    router.eject(engines[0])
+    assert router.healthy_engines() == [engines[0]]
+
+
+def test_least_connections():
+    engines = [create_async_engine(f"postgresql+asyncpg://user@127.0.0.1:{port}/db") for port in (5001, 5002)]
+    router = EngineRouter(engines, balancing=LEAST_CONNECTIONS)
+    assert router.choose() is engines[0]
+    assert router.choose() is engines[0]
+
+    with pytest.raises(ValueError):
+        EngineRouter(engines, balancing="random")
+
+
+async def test_readonly_sessions_use_replicas(pg_container: PostgresContainer):
+    host = pg_container.get_container_host_ip()
+    db_port = pg_container.get_exposed_port(pg_container.port_to_expose)
+    credentials = f"user={pg_container.POSTGRES_USER}&password={pg_container.POSTGRES_PASSWORD}"
+    db_url = f"postgresql+asyncpg://{host}:{db_port}/{pg_container.POSTGRES_DB}?{credentials}"
+    replica_db_url = (
+        f"postgresql+asyncpg:///{pg_container.POSTGRES_DB}?host={host}:1&host={host}:{db_port}&{credentials}"
+    )
+
+    session_maker = SessionMaker(db_url, replica_db_url=replica_db_url)
+    session_maker.initialize()
+    _, live_replica = session_maker.replicas.engines
+
+    @session_maker.transactional(readonly=True)
+    async def select_one():
+        return (await BaseDao().execute(text("SELECT 1"))).scalar()
+
+    try:
+        with pytest.raises(OSError):
+            await select_one()
+        assert session_maker.replicas.healthy_engines() == [live_replica]
+
+        assert await select_one() == 1
+        async with session_maker(readonly=True) as session:
+            assert session.bind is live_replica
+
+        async with session_maker.begin() as session:
+            assert session.bind is session_maker.engine
+
+        session_maker.replicas.eject(live_replica)
+        async with session_maker.begin(readonly=True) as session:
+            assert session.bind is session_maker.engine
+    finally:
+        await session_maker.close()
+
+
+def test_choose_host():
+    primary, standby, dead = ("primary", 5432), ("standby", 5432), ("dead", 5432)
+    states = [(dead, None), (standby, HostState(True, True)), (primary, HostState(False, False))]
+    assert choose_host(states, "any") == standby
+    assert choose_host(states, "primary") == primary
+    assert choose_host(states, "read-write") == primary
+    assert choose_host(states, "standby") == standby
+    assert choose_host(states, "read-only") == standby
+    assert choose_host(states, "prefer-standby") == standby
+    assert choose_host(states[2:], "prefer-standby") == primary
+    assert choose_host(states[:2], "primary") is None
+
+    with pytest.raises(ValueError):
+        HostResolver([primary], target_session_attrs="master")
+
+
+async def test_probe_skips_failed_host():
+    primary, broken = ("primary", 5432), ("broken", 5432)
+    resolver = HostResolver([broken, primary], READ_WRITE)
+
+    async def fetch_state(host, port, probe_args):
+        if (host, port) == broken:
+            raise asyncpg.InterfaceError("connection was closed in the middle of operation")
+        return HostState(in_recovery=False, read_only=False)
+
+    resolver._fetch_state = fetch_state
+    assert await resolver._probe_hosts({}) == primary
+
+
+async def test_engine_failover(pg_container: PostgresContainer):
+    host = pg_container.get_container_host_ip()
+    db_port = pg_container.get_exposed_port(pg_container.port_to_expose)
+    credentials = f"user={pg_container.POSTGRES_USER}&password={pg_container.POSTGRES_PASSWORD}"
+    db_url = f"postgresql+asyncpg:///{pg_container.POSTGRES_DB}?host={host}:1&host={host}:{db_port}&{credentials}"
+
+    engine = get_engine(db_url)
+    try:
+        async with engine.connect() as connection:
+            assert (await connection.execute(text("SELECT 1"))).scalar() == 1
+    finally:
+        await engine.dispose()
+
+    engine = get_engine(db_url, target_session_attrs="standby")
+    try:
+        with pytest.raises(ConnectionError):
+            async with engine.connect():
+                pass
+    finally:
+        await engine.dispose()
+
+    engine = create_async_engine(f"postgresql+asyncpg:///{pg_container.POSTGRES_DB}?{credentials}")
+    resolver = HostResolver([(host, 1), (host, int(db_port))], READ_WRITE)
+    resolver.attach(engine)
+    try:
+        async with engine.connect() as connection:
+            assert resolver.current_host == (host, int(db_port))
+            await connection.execute(text("SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY"))
+            await connection.commit()
+            with pytest.raises(DBAPIError) as e:
+                await connection.execute(text("CREATE TEMPORARY TABLE read_only_check (id int)"))
+            assert e.value.connection_invalidated
+        assert resolver.current_host is None
+
+        async with engine.connect() as connection:
+            assert (await connection.execute(text("SELECT 1"))).scalar() == 1
+        assert resolver.current_host == (host, int(db_port))
+    finally:
+        await engine.dispose()
@@ -1,15 +1,21 @@
 import asyncio
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import pytest
-from sqlalchemy import Column, BigInteger, DateTime, Text, ForeignKey, cast, Integer, text
+from sqlalchemy import Column, BigInteger, DateTime, Text, ForeignKey, cast, Integer, func, event
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.exc import InvalidRequestError
-from sqlalchemy.orm import declarative_base, relationship, joinedload
+from sqlalchemy.orm import declarative_base, relationship, joinedload, selectinload
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.ext.asyncio.result import AsyncCommon
 from testcontainers.postgres import PostgresContainer
 
+from almatest.postgres import TemplateDatabases
+
 from ararat.common.dt import datetime_now
 from ararat.db.dao import BaseDao
+from ararat.db.loader import get_loader
+from ararat.db.keyset import encode_cursor, keyset_values, InvalidCursor
 from ararat.db.session import SessionMaker, MissingCurrentSession
 
 Base = declarative_base()
@@ -21,6 +27,7 @@ class TableForTest(Base):
     creation_time: datetime = Column(DateTime(True), nullable=False)
     str_value: str = Column(Text())
     jsonb_value: dict = Column(JSONB())
+    joined = relationship("JoinedTableForTest", lazy="raise", viewonly=True)
 
 
 class JoinedTableForTest(Base):
@@ -33,31 +40,25 @@ class JoinedTableForTest(Base):
 Session = SessionMaker()
 
 
-@pytest.fixture(scope="module")
-async def session_maker(pg_container: PostgresContainer) -> SessionMaker:
-    db_port = pg_container.get_exposed_port(pg_container.port_to_expose)
-    db_url = (
-        f"postgresql+asyncpg://{pg_container.get_container_host_ip()}:{db_port}/{pg_container.POSTGRES_DB}?"
-        f"user={pg_container.POSTGRES_USER}&password={pg_container.POSTGRES_PASSWORD}"
-    )
-
-    global Session
-    Session.initialize(db_url)
-    yield Session
-    await Session.close()
-
-
-@pytest.fixture(scope="module", autouse=True)
-async def init_db(session_maker: SessionMaker):
-    async with session_maker.engine.begin() as con:
+async def create_schema(db_url: str) -> None:
+    engine = create_async_engine(db_url)
+    async with engine.begin() as con:
         await con.run_sync(Base.metadata.create_all)
+    await engine.dispose()
+
+
+@pytest.fixture(scope="module")
+async def db_template(pg_container: PostgresContainer, template_databases) -> TemplateDatabases:
+    return await template_databases(pg_container, create_schema, name="ararat_db_utils")
 
 
 @pytest.fixture(autouse=True)
-async def delete_rows(session_maker: SessionMaker):
-    async with session_maker.engine.begin() as con:
-        await con.execute(text(f"DELETE FROM {JoinedTableForTest.__tablename__};"))
-        await con.execute(text(f"DELETE FROM {TableForTest.__tablename__};"))
+async def session_maker(db_template: TemplateDatabases) -> SessionMaker:
+    # каждый тест получает чистую копию базы-шаблона вместо DELETE по всем таблицам
+    async with db_template.database() as db_url:
+        Session.initialize(db_url)
+        yield Session
+        await Session.close()
 
 
 class TestAlchemy:
@@ -218,6 +219,173 @@ class TestAlchemy:
             assert page2[1].str_value == "10"
             assert page2[2].str_value == "8"
 
+    async def test_base_dao_keyset_pages(self):
+        first_time = datetime_now()
+        second_time = first_time + timedelta(seconds=1)
+        async with Session.begin():
+            for i in range(1, 19):
+                creation_time = first_time if i % 2 else second_time
+                await BaseDao().add(TableForTest(creation_time=creation_time, str_value=str(i)))
+
+        by_columns = [TableForTest.creation_time, TableForTest.id]
+        async with Session():
+            pages = [page async for page in BaseDao().iter_keyset_pages(by_columns, page_size=4, reverse=False)]
+            assert [len(page) for page in pages] == [4, 4, 4, 4, 2]
+            values = [item.str_value for page in pages for item in page]
+            assert values == [str(i) for i in range(1, 19, 2)] + [str(i) for i in range(2, 19, 2)]
+
+            pages = [page async for page in BaseDao().iter_keyset_pages(by_columns, page_size=5, reverse=(True, False))]
+            values = [item.str_value for page in pages for item in page]
+            assert values == [str(i) for i in range(2, 19, 2)] + [str(i) for i in range(1, 19, 2)]
+
+            page1 = await BaseDao().get_keyset_page(by_columns, None, page_size=6, reverse=True)
+            token = encode_cursor(keyset_values(page1[-1], by_columns))
+            page2 = await BaseDao().get_keyset_page(by_columns, token, page_size=6, reverse=True)
+            assert [item.str_value for item in page1] == ["18", "16", "14", "12", "10", "8"]
+            assert [item.str_value for item in page2] == ["6", "4", "2", "17", "15", "13"]
+
+            with pytest.raises(InvalidCursor):
+                await BaseDao().get_keyset_page(by_columns, "not a cursor", page_size=6)
+
+    async def test_bulk_insert(self):
+        creation_time = datetime_now()
+        values = [
+            {"creation_time": creation_time, "str_value": str(i), "jsonb_value": {"i": i}} for i in range(1, 5001)
+        ]
+        async with Session.begin():
+            ids = await BaseDao().insert_many(TableForTest, values, returning=[TableForTest.id])
+            assert len(ids) == 5000
+            assert await BaseDao().insert_many(TableForTest, values[:10], use_copy=True) == []
+
+        class Rollback(Exception):
+            pass
+
+        # COPY первым запросом в транзакции откатывается вместе с ней
+        with pytest.raises(Rollback):
+            async with Session.begin():
+                await BaseDao().insert_many(TableForTest, values[:10], use_copy=True)
+                raise Rollback()
+
+        async with Session():
+            dao = BaseDao()
+            count = await dao.get_first(dao.select(func.count()).select_from(TableForTest))
+            assert count == 5010
+            found = await dao.get_by_ids(TableForTest.id, ids[:3], preserve_order=True)
+            assert [item.jsonb_value for item in found] == [{"i": 1}, {"i": 2}, {"i": 3}]
+
+        async with Session.begin():
+            upserted = await BaseDao().upsert_many(
+                TableForTest,
+                [
+                    {"id": ids[0], "creation_time": creation_time, "str_value": "updated"},
+                    {"id": ids[-1] + 1000, "creation_time": creation_time, "str_value": "inserted"},
+                ],
+                index_elements=[TableForTest.id],
+                returning=[TableForTest.id, TableForTest.str_value],
+            )
+            assert [tuple(row) for row in upserted] == [(ids[0], "updated"), (ids[-1] + 1000, "inserted")]
+
+            skipped = await BaseDao().upsert_many(
+                TableForTest,
+                [{"id": ids[1], "creation_time": creation_time, "str_value": "skipped"}],
+                index_elements=["id"],
+                update_columns=[],
+                returning=[TableForTest.id],
+            )
+            assert skipped == []
+
+    async def test_get_by_ids_in_chunks(self):
+        async with Session.begin():
+            values = [{"creation_time": datetime_now(), "str_value": str(i % 3)} for i in range(10)]
+            ids = await BaseDao().insert_many(TableForTest, values, returning=[TableForTest.id])
+
+        requested_ids = [ids[5], ids[1], ids[5], ids[7], ids[0], ids[9], ids[3], -1]
+        async with Session():
+            for use_any in (False, True):
+                found = await BaseDao().get_by_ids(
+                    TableForTest.id, requested_ids, preserve_order=True, chunk_size=2, use_any=use_any
+                )
+                assert [item.id for item in found] == [i for i in requested_ids if i != -1]
+
+                found = await BaseDao().get_by_ids(TableForTest.id, requested_ids, chunk_size=2, use_any=use_any)
+                assert sorted(item.id for item in found) == sorted(set(requested_ids) - {-1})
+
+                found_map = await BaseDao().get_map_by_ids(
+                    column=TableForTest.str_value, ids=["0", "1", "0"], reduce=False, chunk_size=1, use_any=use_any
+                )
+                assert {key: len(items) for key, items in found_map.items()} == {"0": 4, "1": 3}
+
+                found = (
+                    await BaseDao()
+                    .order_by(TableForTest.id.desc())
+                    .get_by_ids(TableForTest.id, requested_ids, chunk_size=2, use_any=use_any)
+                )
+                assert [item.id for item in found] == sorted(set(requested_ids) - {-1}, reverse=True)
+
+    async def test_batch_loading(self):
+        async with Session.begin():
+            values = [{"creation_time": datetime_now(), "str_value": str(i)} for i in range(10)]
+            ids = await BaseDao().insert_many(TableForTest, values, returning=[TableForTest.id])
+
+        statements = []
+
+        def count_statement(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(Session.engine.sync_engine, "before_cursor_execute", count_statement)
+        try:
+            async with Session(batch_loading=True) as session:
+                dao1, dao2 = BaseDao(session), BaseDao(session)
+                found1, found2 = await asyncio.gather(
+                    dao1.get_by_ids(TableForTest.id, ids[:5], preserve_order=True),
+                    dao2.get_by_ids(TableForTest.id, [ids[7], ids[3], -1], preserve_order=True),
+                )
+                assert [item.id for item in found1] == ids[:5]
+                assert [item.id for item in found2] == [ids[7], ids[3]]
+                assert len(statements) == 1
+
+                found = await dao1.get_by_ids(TableForTest.id, [ids[3], ids[7], -1])
+                assert {item.id for item in found} == {ids[3], ids[7]}
+                assert len(statements) == 1
+
+                await dao1.add(TableForTest(id=-1, creation_time=datetime_now()))
+                found = await dao2.get_by_ids(TableForTest.id, [-1])
+                assert [item.id for item in found] == [-1]
+                assert len(statements) == 3
+
+                found1, found2 = await asyncio.gather(dao1.get(TableForTest, ids[8]), dao2.get(TableForTest, -2))
+                assert found1.id == ids[8] and found2 is None
+                assert len(statements) == 4
+
+                # кортеж и словарь из одного значения, как в session.get
+                found = await asyncio.gather(
+                    dao1.get(TableForTest, (ids[9],)),
+                    dao2.get(TableForTest, {"id": ids[2]}),
+                    dao1.get(TableForTest, [-3]),
+                )
+                assert [item and item.id for item in found] == [ids[9], ids[2], None]
+                assert len(statements) == 5
+        finally:
+            event.remove(Session.engine.sync_engine, "before_cursor_execute", count_statement)
+
+    async def test_batch_loading_cancelled_waiter(self):
+        async with Session.begin():
+            ids = await BaseDao().insert_many(
+                TableForTest, [{"creation_time": datetime_now()} for _ in range(2)], returning=[TableForTest.id]
+            )
+
+        async with Session(batch_loading=True) as session:
+            loader = get_loader(session, TableForTest.id)
+            cancelled = asyncio.ensure_future(loader.load_many(ids))
+            waiting = asyncio.ensure_future(loader.load_many(ids))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            # кэш очищается раньше, чем ожидающий успевает забрать результат
+            loader.clear()
+            found = await waiting
+            assert sorted(found) == sorted(ids)
+            assert all(len(rows) == 1 for rows in found.values())
+
     async def test_select_one_field(self):
         values = []
         async with Session.begin():
@@ -235,6 +403,61 @@ class TestAlchemy:
             assert result[0] == values[10].id
             assert result[7] == values[17].id
 
+    async def test_stream_all(self, monkeypatch):
+        async with Session.begin():
+            for i in range(1, 19):
+                obj = await BaseDao().add(TableForTest(creation_time=datetime_now(), str_value=str(i)))
+                await BaseDao().add(JoinedTableForTest(id=1000 + i, table_for_test_id=obj.id))
+
+        async with Session():
+            dao = BaseDao()
+            stmt = dao.select(TableForTest).order_by(TableForTest.id.asc())
+            streamed = [item async for item in dao.stream_all(stmt, yield_per=5)]
+            assert [item.str_value for item in streamed] == [str(i) for i in range(1, 19)]
+
+            ids_stmt = dao.select(TableForTest.id).order_by(TableForTest.id.asc())
+            streamed_ids = [item async for item in dao.stream_all(ids_stmt, yield_per=5)]
+            assert streamed_ids == [item.id for item in streamed]
+
+            join_stmt = (
+                dao.select(TableForTest, JoinedTableForTest)
+                .join(JoinedTableForTest, onclause=TableForTest.id == JoinedTableForTest.table_for_test_id)
+                .order_by(TableForTest.id.asc())
+            )
+            async for o1, o2 in dao.stream_all(join_stmt, yield_per=5):
+                assert o2.table_for_test_id == o1.id
+
+            chunks = [chunk async for chunk in dao.stream_chunks(stmt, chunk_size=5)]
+            assert [len(chunk) for chunk in chunks] == [5, 5, 5, 3]
+            assert [item.id for chunk in chunks for item in chunk] == streamed_ids
+
+            joined_stmt = dao.select(TableForTest).options(joinedload(TableForTest.joined)).order_by(TableForTest.id)
+            with pytest.raises(InvalidRequestError, match="selectinload"):
+                [item async for item in dao.stream_all(joined_stmt, yield_per=5)]
+
+            selectin_stmt = (
+                dao.select(TableForTest).options(selectinload(TableForTest.joined)).order_by(TableForTest.id)
+            )
+            streamed = [item async for item in dao.stream_all(selectin_stmt, yield_per=5)]
+            assert [len(item.joined) for item in streamed] == [1] * 18
+
+            # прерванный stream закрывает результат, не дожидаясь сборщика мусора или конца транзакции
+            closed = []
+            close = AsyncCommon.close
+
+            async def tracking_close(result):
+                closed.append(result)
+                await close(result)
+
+            monkeypatch.setattr(AsyncCommon, "close", tracking_close)
+            for stream in (dao.stream_all(stmt, yield_per=5), dao.stream_chunks(stmt, chunk_size=5)):
+                async for _ in stream:
+                    break
+                assert not closed
+                await stream.aclose()
+                assert len(closed) == 1
+                closed.clear()
+
     @Session.transactional()
     async def delete_from_table(self, table) -> int:
         dao = BaseDao()
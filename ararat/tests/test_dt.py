@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytz
+
+from ararat.common.dt import (
+    MSK_TIMEZONE,
+    UTC_TIMEZONE,
+    as_msk,
+    datetime_now,
+    dts_to_millis,
+    get_dt_millis,
+    get_zone,
+    is_naive,
+    localize,
+    millis_to_dt,
+    millis_to_dts,
+)
+
+
+def test_millis_roundtrip():
+    dt = MSK_TIMEZONE.localize(datetime(2024, 5, 6, 7, 8, 9, 123999))
+    millis = get_dt_millis(dt)
+    assert millis == int(dt.replace(microsecond=0).timestamp()) * 1000 + 123
+    assert millis_to_dt(millis) == dt.replace(microsecond=123000)
+    assert millis_to_dt(millis).tzinfo is UTC_TIMEZONE
+    assert millis_to_dt(millis, MSK_TIMEZONE).utcoffset() == timedelta(hours=3)
+    # 1.001 * 1000 во float дает 1000.9999999999999
+    assert get_dt_millis(datetime(1970, 1, 1, 0, 0, 1, 1000, tzinfo=timezone.utc)) == 1001
+    assert get_dt_millis(datetime(1969, 12, 31, 23, 59, 59, 999500, tzinfo=timezone.utc)) == -1
+
+
+def test_naive_millis_are_local():
+    dt = datetime(2024, 5, 6, 7, 8, 9)
+    assert get_dt_millis(dt) == int(dt.timestamp() * 1000)
+
+
+def test_datetime_now():
+    now = datetime_now()
+    assert now.tzinfo is UTC_TIMEZONE
+    assert abs(now - datetime.now(timezone.utc)) < timedelta(seconds=1)
+    assert datetime_now(MSK_TIMEZONE).tzinfo.zone == "Europe/Moscow"
+    assert now.microsecond % 1000 == 0
+    assert is_naive(datetime_now(None))
+    assert datetime_now(None).microsecond % 1000 == 0
+    assert datetime_now(MSK_TIMEZONE).microsecond % 1000 == 0
+    assert abs(datetime_now(None) - datetime.now()) < timedelta(seconds=1)
+
+
+def test_zones():
+    assert get_zone("Europe/Moscow") is get_zone("Europe/Moscow")
+    dt = localize(datetime(2024, 1, 1), get_zone("Europe/Moscow"))
+    assert dt.utcoffset() == timedelta(hours=3)
+    assert as_msk(datetime(2024, 1, 1)) == pytz.utc.localize(datetime(2024, 1, 1))
+    assert as_msk(datetime(2024, 1, 1)).tzinfo.zone == "Europe/Moscow"
+
+
+def test_batch_conversions():
+    dts = [datetime(2024, 1, 1, tzinfo=timezone.utc), None, datetime(2024, 1, 2, tzinfo=timezone.utc)]
+    millis = dts_to_millis(dts)
+    assert millis == [1704067200000, None, 1704153600000]
+    assert millis_to_dts(millis) == dts
+
+
+def test_numpy_conversions():
+    np = pytest.importorskip("numpy")
+    from ararat.common.dt import millis_to_datetime64
+
+    values = np.array(["2024-01-01T00:00:00.123", "1969-12-31T23:59:59.999"], dtype="datetime64[us]")
+    millis = dts_to_millis(values)
+    assert millis.tolist() == [1704067200123, -1]
+    assert (millis_to_datetime64(millis) == values).all()
+    assert millis_to_dts(millis)[0] == datetime(2024, 1, 1, 0, 0, 0, 123000, tzinfo=timezone.utc)
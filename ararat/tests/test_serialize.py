@@ -0,0 +1,177 @@
+import ast
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from enum import Enum
+from uuid import UUID
+
+import pytest
+from pydantic import BaseModel
+
+from ararat.common.dt import MSK_TIMEZONE, UTC_TIMEZONE
+from ararat.serialize.binary_codec import binary_serialize, deserialize, MSGPACK_TAG
+from ararat.serialize.common import json_deserialize, json_serialize
+from ararat.serialize.json_codec import get_codec, set_default_codec, JsonCodec, register_codec
+from ararat.serialize.kafka import KafkaBatchCodec, kafka_json_serialize, SchemaVersionError
+from ararat.serialize.pydantic import pydantic_deserializer
+
+
+class Color(Enum):
+    RED = "red"
+
+
+class Model(BaseModel):
+    id: int
+    created: datetime
+
+
+CREATED = MSK_TIMEZONE.localize(datetime(2024, 1, 2, 3, 4, 5, 6000))
+VALUE = {
+    "datetime": CREATED,
+    "date": date(2024, 1, 2),
+    "uuid": UUID("12345678-1234-5678-1234-567812345678"),
+    "decimal": Decimal("1.10"),
+    "enum": Color.RED,
+    "model": Model(id=1, created=CREATED),
+    "list": [1, "2", None, True],
+    1: "int key",
+}
+EXPECTED = {
+    "datetime": "2024-01-02T03:04:05.006000+03:00",
+    "date": "2024-01-02",
+    "uuid": "12345678-1234-5678-1234-567812345678",
+    "decimal": "1.10",
+    "enum": "red",
+    "model": {"id": 1, "created": "2024-01-02T03:04:05.006000+03:00"},
+    "list": [1, "2", None, True],
+    "1": "int key",
+}
+
+
+@pytest.mark.parametrize("codec_name", ["json", "orjson", "msgspec"])
+def test_codecs(codec_name):
+    pytest.importorskip(codec_name)
+    codec = get_codec(codec_name)
+    assert json.loads(codec.dumps(VALUE)) == EXPECTED
+    assert json.loads(codec.dumps_str(VALUE)) == EXPECTED
+    assert codec.loads(codec.dumps(VALUE)) == EXPECTED
+    assert codec.loads(codec.dumps_str(VALUE)) == EXPECTED
+
+    with pytest.raises(TypeError):
+        codec.dumps({"value": object()})
+
+
+def test_default_codec():
+    try:
+        set_default_codec("json")
+        assert json_serialize({"dt": CREATED}) == '{"dt": "2024-01-02T03:04:05.006000+03:00"}'
+        assert kafka_json_serialize({"dt": CREATED}) == b'{"dt": "2024-01-02T03:04:05.006000+03:00"}'
+
+        class ReprCodec(JsonCodec):
+            name = "repr"
+
+            def dumps(self, value) -> bytes:
+                return repr(value).encode()
+
+            def loads(self, data):
+                return ast.literal_eval(data.decode() if isinstance(data, bytes) else data)
+
+        register_codec("repr", ReprCodec)
+        set_default_codec("repr")
+        assert kafka_json_serialize({"a": 1}) == b"{'a': 1}"
+    finally:
+        set_default_codec(None)
+
+    assert json.loads(json_serialize(VALUE)) == EXPECTED
+    assert json.loads(kafka_json_serialize(VALUE)) == EXPECTED
+
+
+def test_default_codec_is_stdlib_compatible():
+    assert json_serialize({"a": 2**70}) == '{"a": 1180591620717411303424}'
+    assert json_serialize({"a": float("nan")}) == '{"a": NaN}'
+    assert kafka_json_serialize({"a": 2**70}) == b'{"a": 1180591620717411303424}'
+
+
+def test_orjson_big_int():
+    pytest.importorskip("orjson")
+    codec = get_codec("orjson")
+    assert json.loads(codec.dumps({"a": 2**70, "b": CREATED})) == {
+        "a": 2**70,
+        "b": "2024-01-02T03:04:05.006000+03:00",
+    }
+    with pytest.raises(TypeError):
+        codec.dumps({"a": 2**70, "value": object()})
+
+
+def test_deserialize():
+    assert json_deserialize(b'{"a": [1, 2.5, null]}') == {"a": [1, 2.5, None]}
+    assert json_deserialize('{"a": "б"}') == {"a": "б"}
+
+    deserialize = pydantic_deserializer(Model)
+    expected = Model(id=1, created=CREATED)
+    assert deserialize(b'{"id": 1, "created": "2024-01-02T03:04:05.006000+03:00"}') == expected
+    assert deserialize('{"id": "1", "created": "2024-01-02T03:04:05.006000+03:00"}') == expected
+
+
+@pytest.mark.parametrize("compression", [None, "gzip", "lz4", "zstd"])
+def test_kafka_batch_codec(compression):
+    if compression in ("lz4", "zstd"):
+        pytest.importorskip({"lz4": "lz4", "zstd": "zstandard"}[compression])
+
+    values = [{"id": i, "created": CREATED} for i in range(10)]
+    expected = [Model(id=i, created=CREATED) for i in range(10)]
+
+    with ThreadPoolExecutor(2) as executor:
+        producer = KafkaBatchCodec(compression=compression, schema_version="2", executor=executor, parallel_threshold=5)
+        consumer = KafkaBatchCodec(Model, schema_version="2", executor=executor, parallel_threshold=5, chunk_size=3)
+        payloads = producer.serialize_many(values)
+        assert len(payloads) == 10
+        assert consumer.deserialize_many(payloads, producer.headers) == expected
+
+        payload = producer.serialize_batch(values)
+        assert consumer.deserialize_batch(payload, producer.headers) == expected
+
+    with pytest.raises(SchemaVersionError):
+        KafkaBatchCodec(Model, schema_version="3").deserialize_many(payloads, producer.headers)
+
+    assert KafkaBatchCodec().deserialize_many([kafka_json_serialize({"a": 1})]) == [{"a": 1}]
+    empty_headers = [("content-encoding", None), ("schema-version", b""), ("trace", b"\xff\xfe")]
+    assert KafkaBatchCodec().deserialize_many([kafka_json_serialize({"a": 1})], empty_headers) == [{"a": 1}]
+    with pytest.raises(ValueError):
+        KafkaBatchCodec(compression="snappy")
+
+
+def test_binary_codec():
+    pytest.importorskip("msgpack")
+    value = {
+        "msk": CREATED,
+        "utc": UTC_TIMEZONE.localize(datetime(2024, 7, 1, 12)),
+        "offset": datetime(2024, 1, 1, 5, tzinfo=timezone(timedelta(hours=-5, minutes=-30))),
+        "naive": datetime(1960, 1, 1, 0, 0, 0, 1),
+        "date": date(2024, 1, 2),
+        "enum": Color.RED,
+        "model": Model(id=1, created=CREATED),
+        1: [b"bytes", None, 1.5],
+    }
+    data = binary_serialize(value)
+    assert data.startswith(MSGPACK_TAG)
+    assert len(data) < len(json_serialize({**value, 1: ["bytes", None, 1.5]}))
+
+    result = deserialize(data)
+    assert result == {**value, "enum": "red", "model": {"id": 1, "created": CREATED}}
+    assert result["msk"].tzinfo.zone == "Europe/Moscow"
+    assert result["msk"].utcoffset() == timedelta(hours=3)
+    assert result["offset"].utcoffset() == timedelta(hours=-5, minutes=-30)
+    assert result["naive"].tzinfo is None
+
+    assert deserialize(kafka_json_serialize({"a": 1})) == {"a": 1}
+    assert deserialize('{"a": 1}') == {"a": 1}
+
+    deserializer = pydantic_deserializer(Model)
+    assert deserializer(binary_serialize({"id": 1, "created": CREATED})) == Model(id=1, created=CREATED)
+
+    codec = KafkaBatchCodec(Model, compression="gzip", binary=True)
+    payloads = codec.serialize_many([{"id": 1, "created": CREATED}])
+    payloads += KafkaBatchCodec(compression="gzip").serialize_many([{"id": 2, "created": CREATED}])
+    assert codec.deserialize_many(payloads) == [Model(id=1, created=CREATED), Model(id=2, created=CREATED)]
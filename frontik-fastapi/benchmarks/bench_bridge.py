@@ -0,0 +1,286 @@
+"""
+Стоимость моста frontik -> fastapi на запрос: маршруты example_app гоняются в одном процессе через
+frontik_asgi_handler и, для сравнения, через обычный FastAPI с APIRoute. Вызовы get_url заменены заглушкой
+с настраиваемой задержкой, tornado и сеть не участвуют - обработчик получает готовый HTTPServerRequest,
+а ответ складывается в память
+
+    PYTHONPATH=. python benchmarks/bench_bridge.py [--number 2000] [--concurrency 1 16 64]
+        [--upstream-latency 0] [--route /fastapi/route] [--output results.jsonl]
+
+Этапы: scope - от входа в handle_request до вызова asgi приложения, bridge - все, что обработчик делает
+вне asgi приложения, dependencies - solve_dependencies fastapi и решение плана зависимостей до вызова
+endpoint, serialization - serialize_response
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import fastapi.routing
+from fastapi import APIRouter, FastAPI
+from fastapi.routing import APIRoute
+from tornado.httputil import HTTPHeaders, HTTPServerRequest
+
+import example_app.routes
+from ffapi.handler import frontik_asgi_handler, get_current_handler
+from ffapi.planner import get_plan_timings
+from ffapi.router import import_app_routes
+
+# маршрут -> можно ли повторить его на чистом fastapi (DepBuilder требует моста)
+ROUTES = {
+    "/fastapi/route": True,
+    "/fastapi/route_dynamic_style": False,
+    "/other_app/route": True,
+}
+STAGES = ("scope", "bridge", "dependencies", "serialization")
+
+current_stages: ContextVar[Dict[str, float]] = ContextVar("current_stages")
+
+
+class UpstreamStub:
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.calls = 0
+
+    async def get_url(self, host, uri, *args, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return None
+
+
+def timed_stage(stage: str, func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            stages = current_stages.get(None)
+            if stages is not None:
+                stages[stage] = stages.get(stage, 0.0) + time.perf_counter() - start
+
+    return wrapper
+
+
+def instrument_fastapi() -> None:
+    # get_request_handler берет эти функции из глобалов модуля при каждом запросе
+    fastapi.routing.solve_dependencies = timed_stage("dependencies", fastapi.routing.solve_dependencies)
+    fastapi.routing.serialize_response = timed_stage("serialization", fastapi.routing.serialize_response)
+
+
+class TimedApp:
+    def __init__(self, app: FastAPI) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        stages = current_stages.get()
+        stages["app_start"] = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            stages["app_end"] = time.perf_counter()
+            timings = get_plan_timings(scope)
+            if timings is not None and timings.nodes[-1].start is not None:
+                stages["dependencies"] = stages.get("dependencies", 0.0) + timings.nodes[-1].start - timings.start
+
+
+def make_bridge_app() -> FastAPI:
+    app = FastAPI()
+    import_app_routes(app, example_app.routes, "app_router")
+    return app
+
+
+def make_plain_app(bridge_app: FastAPI, upstream: UpstreamStub) -> FastAPI:
+    app = FastAPI()
+    router = APIRouter()
+    for route in bridge_app.routes:
+        if isinstance(route, APIRoute) and ROUTES.get(route.path):
+            router.add_api_route(
+                route.path,
+                getattr(route.endpoint, "__wrapped__", route.endpoint),
+                response_model=route.response_model,
+                methods=list(route.methods),
+            )
+    app.include_router(router)
+    app.dependency_overrides[get_current_handler] = lambda: upstream
+    return app
+
+
+def bridge_caller(app: FastAPI, upstream: UpstreamStub, request_timeout: Optional[float]):
+    class BenchHandler(frontik_asgi_handler(TimedApp(app), request_timeout)):
+        def __init__(self, request: HTTPServerRequest) -> None:
+            self.request = request
+            self.status = None
+            self.chunks: List[bytes] = []
+
+        def set_status(self, status_code, reason=None):
+            self.status = status_code
+
+        def clear_header(self, name):
+            pass
+
+        def add_header(self, name, value):
+            pass
+
+        def write(self, chunk):
+            self.chunks.append(chunk)
+
+        async def flush(self, include_footers=False):
+            pass
+
+        def get_url(self, host, uri, *args, **kwargs):
+            return upstream.get_url(host, uri, *args, **kwargs)
+
+    async def call(path: str) -> int:
+        path, _, query = path.partition("?")
+        request = HTTPServerRequest(
+            method="GET", uri=f"{path}?{query}" if query else path, version="HTTP/1.1", headers=HTTPHeaders()
+        )
+        handler = BenchHandler(request)
+        current_stages.get()["start"] = time.perf_counter()
+        await handler.get()
+        return handler.status
+
+    return call
+
+
+def plain_caller(app: FastAPI):
+    timed_app = TimedApp(app)
+
+    async def call(path: str) -> int:
+        path, _, query = path.partition("?")
+        # так scope собирает asgi сервер, в расходы fastapi это не входит
+        scope = {
+            "type": "http",
+            "scheme": "http",
+            "http_version": "1.1",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "method": "GET",
+            "query_string": query.encode(),
+            "headers": [],
+            "client": ("127.0.0.1", 0),
+            "server": ("127.0.0.1", 80),
+        }
+        status = None
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        current_stages.get()["start"] = time.perf_counter()
+        await timed_app(scope, receive, send)
+        return status
+
+    return call
+
+
+async def measure(
+    call: Callable[[str], Awaitable[int]], path: str, number: int, concurrency: int, upstream: UpstreamStub
+) -> dict:
+    async def one() -> Dict[str, float]:
+        stages: Dict[str, float] = {}
+        token = current_stages.set(stages)
+        try:
+            status = await call(path)
+        finally:
+            current_stages.reset(token)
+        if status != 200:
+            raise RuntimeError(f"{path} returned {status}")
+        end = time.perf_counter()
+        stages["total"] = end - stages["start"]
+        stages["scope"] = stages["app_start"] - stages["start"]
+        stages["bridge"] = stages["total"] - (stages["app_end"] - stages["app_start"])
+        return stages
+
+    for _ in range(min(number, 50)):
+        await one()
+    upstream.calls = 0
+
+    results: List[Dict[str, float]] = []
+    per_worker = max(1, number // concurrency)
+
+    async def worker():
+        for _ in range(per_worker):
+            results.append(await one())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(result["total"] for result in results)
+    return {
+        "ops": len(results),
+        "ops_per_s": round(len(results) / elapsed, 2),
+        "p50_ms": round(_percentile(latencies, 0.5) * 1e3, 4),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1e3, 4),
+        "upstream_calls_per_request": round(upstream.calls / len(results), 2),
+        **{f"{stage}_us": round(statistics.fmean(r.get(stage, 0.0) for r in results) * 1e6, 2) for stage in STAGES},
+    }
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def emit(record: dict, output) -> None:
+    if output is not None:
+        output.write(json.dumps(record) + "\n")
+    stages = "  ".join(f"{stage} {record[f'{stage}_us']:8.1f}" for stage in STAGES)
+    print(
+        f"{record['mode']:<7} {record['route']:<30} c={record['concurrency']:<4} {record['ops_per_s']:>9.1f} rps"
+        f"  p50 {record['p50_ms']:7.3f} ms  p99 {record['p99_ms']:7.3f} ms  us: {stages}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--upstream-latency", type=float, default=0.0, help="seconds per get_url call")
+    parser.add_argument("--request-timeout", type=float, default=None)
+    parser.add_argument("--route", nargs="*", default=list(ROUTES), choices=list(ROUTES))
+    parser.add_argument("--output", help="jsonl file for results")
+    args = parser.parse_args()
+
+    instrument_fastapi()
+    upstream = UpstreamStub(args.upstream_latency)
+    bridge_app = make_bridge_app()
+    callers = {
+        "ffapi": bridge_caller(bridge_app, upstream, args.request_timeout),
+        "fastapi": plain_caller(make_plain_app(bridge_app, upstream)),
+    }
+
+    output = open(args.output, "w") if args.output else None
+    try:
+        for route in args.route:
+            for concurrency in args.concurrency:
+                for mode, call in callers.items():
+                    if mode == "fastapi" and not ROUTES[route]:
+                        continue
+                    result = await measure(call, route, args.number, concurrency, upstream)
+                    record = {
+                        "mode": mode,
+                        "route": route,
+                        "concurrency": concurrency,
+                        "upstream_latency_s": args.upstream_latency,
+                        **result,
+                    }
+                    emit(record, output)
+    finally:
+        if output is not None:
+            output.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
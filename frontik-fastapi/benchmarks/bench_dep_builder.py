@@ -0,0 +1,72 @@
+"""
+Накладные расходы DepBuilder.build: старый путь (get_dependant + solve_dependencies на каждый вызов)
+против скомпилированного плана
+
+    PYTHONPATH=. python benchmarks/bench_dep_builder.py [--number 2000]
+"""
+
+import argparse
+import asyncio
+import time
+
+from fastapi import Depends, Query
+from fastapi.dependencies.utils import get_dependant, solve_dependencies
+from starlette.requests import Request
+
+from ffapi.dep import async_dep, DepBuilder, DepsOverridesProvider
+
+
+async def get_user_id(user_id: int = Query(1)) -> int:
+    return user_id
+
+
+async def fetch_resume_ids(user_id: int = Depends(get_user_id)):
+    return [1, 2, 3]
+
+
+async def fetch_user(user_id: int = Depends(get_user_id), resume_ids=async_dep(fetch_resume_ids)):
+    return {"id": user_id, "resume_ids": await resume_ids}
+
+
+async def fetch_vacancies(page: int = Query(0), user=async_dep(fetch_user), resume_ids=async_dep(fetch_resume_ids)):
+    user, resume_ids = await asyncio.gather(user, resume_ids)
+    return []
+
+
+async def page(user=async_dep(fetch_user), vacancies=async_dep(fetch_vacancies)):
+    return await asyncio.gather(user, vacancies)
+
+
+async def legacy_build(dep, scope):
+    dependant = get_dependant(path="", call=dep)
+    overrides_provider = DepsOverridesProvider(dependency_overrides={**DepsOverridesProvider.default_overrides})
+    values, errors, _, _, _ = await solve_dependencies(
+        request=Request(scope=scope),
+        dependant=dependant,
+        dependency_overrides_provider=overrides_provider,
+    )
+    return dep(**values)
+
+
+async def measure(name: str, number: int, build) -> None:
+    for _ in range(10):
+        await (await build())
+
+    start = time.perf_counter()
+    for _ in range(number):
+        await (await build())
+    print(f"{name:<30} {(time.perf_counter() - start) / number * 1e6:10.1f} us/build")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    scope = {"type": "http", "query_string": b"user_id=5&page=1", "headers": []}
+    await measure("get_dependant + solve", args.number, lambda: legacy_build(page, scope))
+    await measure("DepBuilder.build", args.number, lambda: DepBuilder(page).scope(scope).build())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
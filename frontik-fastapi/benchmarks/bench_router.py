@@ -0,0 +1,94 @@
+"""
+Маршрутизация: обработчик на каждый маршрут (frontik_handlers) против общего обработчика на префикс
+с префиксным деревом (frontik_prefix_handlers). Меряются старт и поиск маршрута на запрос
+
+    PYTHONPATH=. python benchmarks/bench_router.py [--prefixes 20] [--routes 25] [--number 20000]
+"""
+
+import argparse
+import random
+import re
+import time
+
+from fastapi import FastAPI
+from starlette.routing import Match
+
+from ffapi.dispatch import TrieRouter
+from ffapi.router import frontik_handlers, frontik_prefix_handlers
+
+
+def make_app(prefixes: int, routes: int) -> FastAPI:
+    app = FastAPI()
+
+    async def endpoint():
+        return {}
+
+    for prefix in range(prefixes):
+        for route in range(routes):
+            app.add_api_route(f"/service{prefix}/resource{route}/{{item_id}}", endpoint, methods=["GET"])
+    return app
+
+
+def measure_startup(name: str, number: int, build) -> None:
+    start = time.perf_counter()
+    for _ in range(number):
+        build()
+    print(f"{name:<40} {(time.perf_counter() - start) / number * 1e3:10.2f} ms/startup")
+
+
+def measure_requests(name: str, paths, match) -> None:
+    start = time.perf_counter()
+    for path in paths:
+        match(path)
+    print(f"{name:<40} {(time.perf_counter() - start) / len(paths) * 1e6:10.2f} us/request")
+
+
+def linear_match(handlers, routes):
+    patterns = [re.compile(pattern) for pattern, _ in handlers]
+
+    def match(path):
+        # tornado перебирает шаблоны обработчиков, а потом starlette так же перебирает маршруты
+        next(pattern for pattern in patterns if pattern.match(path))
+        scope = {"type": "http", "path": path, "method": "GET", "root_path": ""}
+        next(route for route in routes if route.matches(scope)[0] == Match.FULL)
+
+    return match
+
+
+def trie_match(handlers, trie_router):
+    patterns = [re.compile(pattern) for pattern, _ in handlers]
+
+    def match(path):
+        next(pattern for pattern in patterns if pattern.match(path))
+        scope = {"type": "http", "path": path, "method": "GET", "root_path": ""}
+        next(route for route in trie_router.trie.candidates(path) if route.matches(scope)[0] == Match.FULL)
+
+    return match
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prefixes", type=int, default=20)
+    parser.add_argument("--routes", type=int, default=25)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    app = make_app(args.prefixes, args.routes)
+    print(f"{len(app.routes)} routes, {args.prefixes} prefixes")
+
+    measure_startup("frontik_handlers", 20, lambda: frontik_handlers(app))
+    measure_startup(
+        "frontik_prefix_handlers + trie", 20, lambda: (frontik_prefix_handlers(app), TrieRouter(app.router))
+    )
+
+    random.seed(0)
+    paths = [
+        f"/service{random.randrange(args.prefixes)}/resource{random.randrange(args.routes)}/{i}"
+        for i in range(args.number)
+    ]
+    measure_requests("linear handlers + starlette router", paths, linear_match(frontik_handlers(app), app.routes))
+    measure_requests("prefix handlers + trie", paths, trie_match(frontik_prefix_handlers(app), TrieRouter(app.router)))
+
+
+if __name__ == "__main__":
+    main()
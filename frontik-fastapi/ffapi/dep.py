@@ -5,11 +5,14 @@ from functools import wraps
 from typing import Mapping, Callable, Any
 
 from fastapi import params
-from fastapi.dependencies.utils import solve_dependencies, get_dependant
-from fastapi.exceptions import RequestValidationError
+from starlette.background import BackgroundTasks
 from starlette.requests import Request
+from starlette.responses import Response
 
 from ffapi.handler import current_scope
+from ffapi.dep_tasks import register_async_dep, start_async_dep
+from ffapi.planner import get_call_plan, PlanRun, read_body
+from ffapi.request_cache import request_cache_context
 
 
 def sync_dep(func) -> params.Depends:
@@ -27,12 +30,13 @@ def async_dep(func: Callable[..., T]) -> T:
         return params.Depends(_cache[func])
 
     @wraps(func)
-    async def wrapper(*args, **kwargs):
-        task = asyncio.create_task(func(*args, **kwargs))
+    async def wrapper(**kwargs):
+        task = start_async_dep(func, kwargs)
         await asyncio.sleep(0)
         return task
 
     _cache[func] = wrapper
+    register_async_dep(wrapper, func)
     return params.Depends(wrapper)
 
 
@@ -60,10 +64,10 @@ class DepBuilder(typing.Generic[T]):
         self.dep = dep
         self._path = ""
         self._scope: typing.Optional[Mapping] = current_scope.get(None)
-        self._overrides: typing.Dict[Callable[..., V], Callable[..., V]] = {}
+        self._overrides: typing.Dict[Callable[..., V], V] = {}
 
     def override(self, sub_dep: Callable[..., V], value: V) -> "DepBuilder[T]":
-        self._overrides[sub_dep] = wrap_by_lambda(value)
+        self._overrides[sub_dep] = value
         return self
 
     def path(self, path: str) -> "DepBuilder[T]":
@@ -75,28 +79,19 @@ class DepBuilder(typing.Generic[T]):
         return self
 
     async def build(self, request: Request = None) -> T:
-        dependant = get_dependant(path=self._path, call=self.dep)
+        plan = get_call_plan(self.dep, self._path, DepsOverridesProvider.default_overrides, frozenset(self._overrides))
 
-        all_overrides = {**DepsOverridesProvider.default_overrides, **self._overrides}
-        overrides_provider = DepsOverridesProvider(dependency_overrides=all_overrides)
         if request is None:
             if self._scope is None:
                 self._scope = {"type": "http", "query_string": "", "headers": []}
             request = Request(scope=self._scope)
-            form = None
+            body = None
         else:
-            form = await request.form()
-
-        solved = await solve_dependencies(
-            request=request,
-            body=form,
-            dependant=dependant,
-            dependency_overrides_provider=overrides_provider,
-        )
-
-        values, errors, background_tasks, sub_response, dependency_cache = solved
-        if errors:
-            raise RequestValidationError(errors, body=form)
+            body = await read_body(request, plan.body_field)
+
+        with request_cache_context():
+            plan_run = PlanRun(plan, request, body, BackgroundTasks(), Response(), self._overrides)
+            values = await plan_run.solve()
 
         return self.dep(**values)
 
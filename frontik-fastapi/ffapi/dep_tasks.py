@@ -0,0 +1,25 @@
+import asyncio
+import typing
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from ffapi.request_cache import get_request_cache
+from ffapi.task_group import create_task
+
+T = typing.TypeVar("T")
+
+_async_dep_funcs: Dict[Callable[..., Any], Callable[..., Any]] = {}
+
+
+def register_async_dep(wrapper: Callable[..., Any], func: Callable[..., Any]) -> None:
+    _async_dep_funcs[wrapper] = func
+
+
+def get_async_dep_func(call: Callable[..., Any]) -> Optional[Callable[..., Any]]:
+    return _async_dep_funcs.get(call)
+
+
+def start_async_dep(func: Callable[..., typing.Coroutine[Any, Any, T]], kwargs: Mapping[str, Any]) -> "asyncio.Task[T]":
+    cache = get_request_cache()
+    if cache is None:
+        return create_task(func(**kwargs))
+    return cache.get_or_start(func, kwargs, create_task)
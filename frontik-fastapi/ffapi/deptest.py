@@ -5,6 +5,7 @@ from typing import Callable, Optional, Any, Mapping
 from fastapi import FastAPI
 
 from ffapi.dep import wrap_by_lambda, DepsOverridesProvider
+from ffapi.planner import invalidate_plans
 
 
 @contextmanager
@@ -23,8 +24,10 @@ def override_dependency(overrides: Mapping[Callable, Any], app: Optional[FastAPI
     provider_new_overrides = copy(provider_old_overrides)
     provider_new_overrides.update(overrides_lambda)
     DepsOverridesProvider.default_overrides = provider_new_overrides
+    invalidate_plans()
 
     yield app
     if app:
         app.dependency_overrides = old_overrides
     DepsOverridesProvider.default_overrides = provider_old_overrides
+    invalidate_plans()
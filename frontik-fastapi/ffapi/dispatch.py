@@ -0,0 +1,100 @@
+import copy
+import typing
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI
+from starlette.routing import BaseRoute, Match, Router
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+def route_static_segments(route: BaseRoute) -> List[str]:
+    path = getattr(route, "path_format", None) or getattr(route, "path", "")
+    segments = []
+    for segment in path.split("/"):
+        if "{" in segment:
+            break
+        if segment:
+            segments.append(segment)
+    return segments
+
+
+class _TrieNode:
+    __slots__ = ("children", "routes")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.routes: List[int] = []
+
+
+class RouteTrie:
+    """
+    Префиксное дерево по статическим сегментам пути маршрутов.
+    Для пути запроса отдает только маршруты, чей статический префикс с ним совпадает, в порядке регистрации
+    """
+
+    def __init__(self, routes: typing.Sequence[BaseRoute]) -> None:
+        self.routes = list(routes)
+        self._root = _TrieNode()
+        for index, route in enumerate(self.routes):
+            node = self._root
+            for segment in route_static_segments(route):
+                node = node.children.setdefault(segment, _TrieNode())
+            node.routes.append(index)
+
+    def candidates(self, path: str) -> List[BaseRoute]:
+        node = self._root
+        indexes = list(node.routes)
+        for segment in path.split("/"):
+            if not segment:
+                continue
+            node = node.children.get(segment)
+            if node is None:
+                break
+            indexes.extend(node.routes)
+        indexes.sort()
+        return [self.routes[index] for index in indexes]
+
+
+class TrieRouter:
+    """
+    Выбирает маршрут через RouteTrie, а все, что не нашлось полным совпадением (405, редиректы слешей, 404, lifespan),
+    отдает исходному роутеру приложения
+    """
+
+    def __init__(self, router: Router) -> None:
+        self.router = router
+        self.trie = RouteTrie(router.routes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "lifespan":
+            scope.setdefault("router", self.router)
+            for route in self.trie.candidates(scope["path"]):
+                match, child_scope = route.matches(scope)
+                if match == Match.FULL:
+                    scope.update(child_scope)
+                    await route.handle(scope, receive, send)
+                    return
+
+        await self.router(scope, receive, send)
+
+
+class TrieDispatcher:
+    """
+    ASGI-приложение поверх FastAPI с тем же стеком middleware, но с маршрутизацией через TrieRouter.
+    Маршруты читаются при первом запросе, после rebuild() перечитываются
+    """
+
+    def __init__(self, fastapi_app: FastAPI) -> None:
+        self.fastapi_app = fastapi_app
+        self._middleware_stack: Optional[ASGIApp] = None
+
+    def rebuild(self) -> None:
+        app = copy.copy(self.fastapi_app)
+        app.router = TrieRouter(self.fastapi_app.router)
+        self._middleware_stack = app.build_middleware_stack()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> Any:
+        if self._middleware_stack is None:
+            self.rebuild()
+        scope["app"] = self.fastapi_app
+        await self._middleware_stack(scope, receive, send)
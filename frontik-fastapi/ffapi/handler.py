@@ -1,8 +1,15 @@
+import asyncio
 from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
 
 from frontik.handler import PageHandler
 
+from ffapi.request_cache import current_request_cache, RequestResultCache
+from ffapi.task_group import current_task_group, DependencyTaskGroup
+
 CHARSET = "utf-8"
+HEADER_CHARSET = "latin-1"
 
 current_scope = ContextVar("_current_scope")
 
@@ -13,18 +20,31 @@ def get_current_handler():
     return current_handler.get()
 
 
-def frontik_asgi_handler(asgi_app):
+@lru_cache(maxsize=1024)
+def _encode_header_name(name: str) -> bytes:
+    return name.lower().encode(HEADER_CHARSET)
+
+
+@lru_cache(maxsize=1024)
+def _decode_header_name(name: bytes) -> str:
+    return name.decode(HEADER_CHARSET)
+
+
+def frontik_asgi_handler(asgi_app, request_timeout: Optional[float] = None):
     class AsgiHandler(PageHandler):
+        task_group: Optional[DependencyTaskGroup] = None
+        disconnected: Optional[asyncio.Event] = None
+
         async def handle_request(self):
-            headers = []
-            for header in self.request.headers:
-                for value in self.request.headers.get_list(header):
-                    headers.append(
-                        (header.encode(CHARSET).lower(), value.encode(CHARSET))
-                    )
+            # tornado хранит заголовки строками, декодированными из latin-1, поэтому обратно кодируем так же
+            headers = [
+                (_encode_header_name(name), value.encode(HEADER_CHARSET))
+                for name, value in self.request.headers.get_all()
+            ]
 
             scope = {
-                "type": self.request.protocol,
+                "type": "http",
+                "scheme": self.request.protocol,
                 "http_version": self.request.version,
                 "path": self.request.path,
                 "method": self.request.method,
@@ -34,15 +54,26 @@ def frontik_asgi_handler(asgi_app):
             }
             current_scope_token = current_scope.set(scope)
             current_handler_token = current_handler.set(self)
+            current_request_cache_token = current_request_cache.set(RequestResultCache())
+            self.task_group = DependencyTaskGroup(request_timeout)
+            current_task_group_token = current_task_group.set(self.task_group)
+            self.disconnected = asyncio.Event()
+            body_sent = False
 
             async def receive():
-                return {
-                    "body": self.request.body,
-                    "type": "http.request",
-                    "more_body": False,
-                }
+                nonlocal body_sent
+                # тело уже целиком прочитано tornado, отдаем его одним сообщением без копирования,
+                # а дальше, как требует ASGI, ждем разрыва соединения
+                if not body_sent:
+                    body_sent = True
+                    return {"type": "http.request", "body": self.request.body, "more_body": False}
+                await self.disconnected.wait()
+                return {"type": "http.disconnect"}
 
             async def send(data):
+                if self.disconnected.is_set():
+                    return
+
                 if data["type"] == "http.response.start":
                     self.set_status(data["status"])
                     self.clear_header("content-type")
@@ -50,19 +81,31 @@ def frontik_asgi_handler(asgi_app):
                     self.clear_header("date")
                     for h in data["headers"]:
                         if len(h) == 2:
-                            self.add_header(h[0].decode(CHARSET), h[1].decode(CHARSET))
+                            self.add_header(_decode_header_name(h[0]), h[1].decode(HEADER_CHARSET))
                 elif data["type"] == "http.response.body":
-                    self.write(data["body"])
+                    body = data.get("body", b"")
+                    if body:
+                        self.write(body)
+                    if data.get("more_body", False):
+                        await self.flush()
                 else:
-                    raise RuntimeError(
-                        f"Unsupported response type \"{data['type']}\" for asgi app"
-                    )
+                    raise RuntimeError(f"Unsupported response type \"{data['type']}\" for asgi app")
 
             try:
                 await asgi_app(scope, receive, send)
             finally:
                 current_scope.reset(current_scope_token)
                 current_handler.reset(current_handler_token)
+                current_request_cache.reset(current_request_cache_token)
+                current_task_group.reset(current_task_group_token)
+                await self.task_group.close()
+
+        def on_connection_close(self):
+            super().on_connection_close()
+            if self.disconnected is not None:
+                self.disconnected.set()
+            if self.task_group is not None:
+                self.task_group.cancel()
 
         async def get(self):
             await self.handle_request()
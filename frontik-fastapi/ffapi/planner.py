@@ -0,0 +1,396 @@
+import copy
+import dataclasses
+import email.message
+import json
+import time
+import typing
+from typing import Any, Callable, Collection, Dict, FrozenSet, Hashable, List, Mapping, Optional, Tuple
+
+from fastapi import params
+from fastapi.dependencies.models import Dependant
+from fastapi.dependencies.utils import (
+    get_body_field,
+    get_dependant,
+    is_async_gen_callable,
+    is_coroutine_callable,
+    is_gen_callable,
+    solve_dependencies,
+    solve_generator,
+)
+from fastapi.exceptions import RequestValidationError
+from pydantic.error_wrappers import ErrorWrapper
+from pydantic.fields import ModelField
+from starlette.background import BackgroundTasks
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
+
+from ffapi.dep_tasks import get_async_dep_func, start_async_dep
+from ffapi.request_cache import request_cache_context
+from ffapi.task_group import task_group_context
+
+PLAN_TIMINGS_SCOPE_KEY = "ffapi.plan_timings"
+PARSED_BODY_SCOPE_KEY = "ffapi.parsed_body"
+
+_FAILED = object()
+
+
+@dataclasses.dataclass
+class PlanNode:
+    index: int
+    name: str
+    call: Optional[Callable[..., Any]]
+    dependant: Dependant
+    dependencies: List[Tuple[Optional[str], int]]
+    async_dep_func: Optional[Callable[..., Any]] = None
+    value_key: Optional[Callable[..., Any]] = None
+    has_params: bool = True
+
+
+@dataclasses.dataclass
+class DependencyPlan:
+    nodes: List[PlanNode]
+    body_field: Optional[ModelField] = None
+
+    @property
+    def root(self) -> PlanNode:
+        return self.nodes[-1]
+
+
+def compile_plan(
+    dependant: Dependant,
+    overrides: Optional[Mapping[Callable, Callable]] = None,
+    value_overrides: Collection[Callable] = (),
+) -> DependencyPlan:
+    nodes: List[PlanNode] = []
+    cached: Dict[Any, int] = {}
+
+    def add_value_node(call: Callable[..., Any]) -> int:
+        node = PlanNode(
+            index=len(nodes),
+            name=getattr(call, "__qualname__", repr(call)),
+            call=None,
+            dependant=Dependant(),
+            dependencies=[],
+            value_key=call,
+            has_params=False,
+        )
+        nodes.append(node)
+        return node.index
+
+    def visit(current: Dependant) -> int:
+        dependencies = []
+        for sub_dependant in current.dependencies:
+            if sub_dependant.call in value_overrides:
+                if sub_dependant.cache_key not in cached:
+                    cached[sub_dependant.cache_key] = add_value_node(sub_dependant.call)
+                dependencies.append((sub_dependant.name, cached[sub_dependant.cache_key]))
+                continue
+
+            use_sub_dependant = sub_dependant
+            call = overrides.get(sub_dependant.call, sub_dependant.call) if overrides else sub_dependant.call
+            if call is not sub_dependant.call:
+                use_sub_dependant = get_dependant(
+                    path=sub_dependant.path,
+                    call=call,
+                    name=sub_dependant.name,
+                    security_scopes=sub_dependant.security_scopes,
+                )
+
+            if sub_dependant.use_cache and sub_dependant.cache_key in cached:
+                index = cached[sub_dependant.cache_key]
+            else:
+                index = visit(use_sub_dependant)
+                cached.setdefault(sub_dependant.cache_key, index)
+            dependencies.append((sub_dependant.name, index))
+
+        stripped = copy.copy(current)
+        stripped.dependencies = []
+        async_dep_func = get_async_dep_func(current.call)
+        node = PlanNode(
+            index=len(nodes),
+            name=getattr(current.call, "__qualname__", repr(current.call)),
+            call=current.call,
+            dependant=stripped,
+            dependencies=dependencies,
+            async_dep_func=async_dep_func,
+            has_params=_has_params(stripped),
+        )
+        nodes.append(node)
+        return node.index
+
+    visit(dependant)
+    return DependencyPlan(nodes)
+
+
+def _has_params(dependant: Dependant) -> bool:
+    return bool(
+        dependant.path_params
+        or dependant.query_params
+        or dependant.header_params
+        or dependant.cookie_params
+        or dependant.body_params
+        or dependant.http_connection_param_name
+        or dependant.request_param_name
+        or dependant.websocket_param_name
+        or dependant.response_param_name
+        or dependant.background_tasks_param_name
+        or dependant.security_scopes_param_name
+    )
+
+
+_MAX_CACHED_PLANS = 1024
+_plans: Dict[Hashable, DependencyPlan] = {}
+
+
+def get_cached_plan(key: Hashable, compile_: Callable[[], DependencyPlan]) -> DependencyPlan:
+    plan = _plans.get(key)
+    if plan is None:
+        if len(_plans) >= _MAX_CACHED_PLANS:
+            _plans.clear()
+        plan = _plans[key] = compile_()
+    return plan
+
+
+def get_call_plan(
+    call: Callable[..., Any],
+    path: str = "",
+    overrides: Optional[Mapping[Callable, Callable]] = None,
+    value_overrides: FrozenSet[Callable] = frozenset(),
+) -> DependencyPlan:
+    def compile_call_plan() -> DependencyPlan:
+        dependant = get_dependant(path=path, call=call)
+        plan = compile_plan(dependant, overrides, value_overrides)
+        plan.body_field = get_body_field(dependant=dependant, name=getattr(call, "__name__", "dependency"))
+        return plan
+
+    # overrides не входят в ключ: override_dependency сбрасывает кэш через invalidate_plans
+    return get_cached_plan((call, path, value_overrides), compile_call_plan)
+
+
+def invalidate_plans() -> None:
+    _plans.clear()
+
+
+@dataclasses.dataclass
+class NodeTiming:
+    name: str
+    dependencies: List[int]
+    start: Optional[float] = None
+    end: Optional[float] = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.start is None or self.end is None:
+            return None
+        return self.end - self.start
+
+    def finish(self, *args) -> None:
+        self.end = time.perf_counter()
+
+
+class PlanTimings:
+    def __init__(self, plan: DependencyPlan) -> None:
+        self.start = time.perf_counter()
+        self.nodes = [NodeTiming(node.name, [index for _, index in node.dependencies]) for node in plan.nodes]
+
+    def critical_path(self) -> List[NodeTiming]:
+        node = self.nodes[-1]
+        path = [node]
+        while True:
+            finished = [self.nodes[index] for index in node.dependencies if self.nodes[index].end is not None]
+            if not finished:
+                break
+            node = max(finished, key=lambda timing: timing.end)
+            path.append(node)
+        return path[::-1]
+
+    @property
+    def critical_path_duration(self) -> float:
+        end = self.nodes[-1].end or max((node.end for node in self.nodes if node.end is not None), default=self.start)
+        return end - self.start
+
+    def format_critical_path(self) -> str:
+        return " -> ".join(
+            f"{node.name} {(node.duration or 0) * 1000:.1f}ms"
+            for node in self.critical_path()
+            if node.start is not None
+        )
+
+
+def get_plan_timings(scope: Mapping) -> Optional[PlanTimings]:
+    return scope.get(PLAN_TIMINGS_SCOPE_KEY)
+
+
+class PlanRun:
+    def __init__(
+        self,
+        plan: DependencyPlan,
+        request: Request,
+        body: Any,
+        background_tasks: BackgroundTasks,
+        response: Response,
+        override_values: Optional[Mapping[Callable, Any]] = None,
+    ) -> None:
+        self.plan = plan
+        self.override_values = override_values or {}
+        self.request = request
+        self.body = body
+        self.background_tasks = background_tasks
+        self.response = response
+        self.timings = PlanTimings(plan)
+        self._results: Dict[int, Any] = {}
+        self._errors: Dict[int, List[Any]] = {}
+
+    async def solve(self) -> Dict[str, Any]:
+        # обычные зависимости решаются по очереди в задаче запроса и в порядке fastapi: так они видят ContextVar
+        # запроса, генераторы закрываются в том же контексте, а проверки из dependencies маршрута выполняются
+        # раньше остальных. Заранее, как только готовы входы, запускаются только задачи async_dep, и то после
+        # зависимостей уровня маршрута
+        gate = max((index for name, index in self.plan.root.dependencies if name is None), default=-1)
+        early = [node for node in self.plan.nodes if node.async_dep_func is not None and node.index > gate]
+        if gate < 0:
+            early = await self._start_ready(early)
+        for node in self.plan.nodes:
+            if node.index not in self._results:
+                self._results[node.index] = await self._run_node(node)
+            if early and node.index >= gate:
+                early = await self._start_ready(early)
+
+        if self._errors:
+            errors = [error for index in sorted(self._errors) for error in self._errors[index]]
+            raise RequestValidationError(errors, body=self.body)
+        return self._results[self.plan.root.index]
+
+    async def _start_ready(self, nodes: List[PlanNode]) -> List[PlanNode]:
+        waiting = []
+        for node in nodes:
+            if node.index in self._results:
+                continue
+            if all(index in self._results for _, index in node.dependencies):
+                self._results[node.index] = await self._run_node(node)
+            else:
+                waiting.append(node)
+        return waiting
+
+    async def _run_node(self, node: PlanNode) -> Any:
+        if node.value_key is not None:
+            return self.override_values[node.value_key]
+
+        if node.has_params:
+            values, errors, _, _, _ = await solve_dependencies(
+                request=self.request,
+                dependant=node.dependant,
+                body=self.body,
+                background_tasks=self.background_tasks,
+                response=self.response,
+            )
+            if errors:
+                self._errors[node.index] = errors
+        else:
+            values, errors = {}, []
+        failed = bool(errors)
+
+        for name, index in node.dependencies:
+            value = self._results[index]
+            if value is _FAILED:
+                failed = True
+            elif name is not None:
+                values[name] = value
+        if failed:
+            return _FAILED
+
+        timing = self.timings.nodes[node.index]
+        timing.start = time.perf_counter()
+        if node is self.plan.root:
+            return values
+
+        if node.async_dep_func is not None:
+            task = start_async_dep(node.async_dep_func, values)
+            task.add_done_callback(timing.finish)
+            return task
+
+        try:
+            call = node.call
+            if is_gen_callable(call) or is_async_gen_callable(call):
+                return await solve_generator(
+                    call=call, stack=self.request.scope.get("fastapi_astack"), sub_values=values
+                )
+            if is_coroutine_callable(call):
+                return await call(**values)
+            return await run_in_threadpool(call, **values)
+        finally:
+            timing.finish()
+
+
+async def read_body(request: Request, body_field: Optional[ModelField]) -> Any:
+    """
+    Разбирает тело только если зависимостям нужны body или form параметры.
+    Результат кэшируется в scope, чтобы вложенные build_dep не разбирали тело повторно
+    """
+    if body_field is None:
+        return None
+
+    is_form = isinstance(body_field.field_info, params.Form)
+    parsed_bodies = request.scope.setdefault(PARSED_BODY_SCOPE_KEY, {})
+    if is_form in parsed_bodies:
+        return parsed_bodies[is_form]
+
+    try:
+        body = await _parse_body(request, is_form)
+    except json.JSONDecodeError as e:
+        raise RequestValidationError([ErrorWrapper(e, ("body", e.pos))], body=e.doc) from e
+    parsed_bodies[is_form] = body
+    return body
+
+
+async def _parse_body(request: Request, is_form: bool) -> Any:
+    if is_form:
+        return await request.form()
+
+    body_bytes = await request.body()
+    if not body_bytes:
+        return None
+    content_type_value = request.headers.get("content-type")
+    if not content_type_value:
+        return await request.json()
+    message = email.message.Message()
+    message["content-type"] = content_type_value
+    if message.get_content_maintype() == "application":
+        subtype = message.get_content_subtype()
+        if subtype == "json" or subtype.endswith("+json"):
+            return await request.json()
+    return body_bytes
+
+
+def planned_endpoint(
+    dependant: Dependant,
+    body_field: Optional[ModelField] = None,
+    dependency_overrides_provider: Optional[Any] = None,
+) -> Callable[..., typing.Awaitable[Any]]:
+    plan = compile_plan(dependant)
+    endpoint = dependant.call
+
+    async def run_plan(request: Request, background_tasks: BackgroundTasks, response: Response) -> Any:
+        overrides = getattr(dependency_overrides_provider, "dependency_overrides", None)
+        if overrides:
+            request_plan = get_cached_plan(
+                (dependant, frozenset(overrides.items())), lambda: compile_plan(dependant, overrides)
+            )
+        else:
+            request_plan = plan
+
+        body = await read_body(request, body_field)
+        plan_run = PlanRun(request_plan, request, body, background_tasks, response)
+        request.scope[PLAN_TIMINGS_SCOPE_KEY] = plan_run.timings
+        async with task_group_context():
+            with request_cache_context():
+                values = await plan_run.solve()
+                try:
+                    if is_coroutine_callable(endpoint):
+                        return await endpoint(**values)
+                    return await run_in_threadpool(endpoint, **values)
+                finally:
+                    plan_run.timings.nodes[-1].finish()
+
+    return run_plan
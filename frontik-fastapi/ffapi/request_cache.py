@@ -0,0 +1,76 @@
+import asyncio
+import typing
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Hashable, Mapping, Optional
+
+current_request_cache = ContextVar("_current_request_cache")
+
+_UNHASHABLE = object()
+
+
+class RequestResultCache:
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self._results: Dict[Hashable, asyncio.Task] = {}
+
+    def get_or_start(
+        self,
+        func: Callable[..., typing.Coroutine[Any, Any, Any]],
+        kwargs: Mapping[str, Any],
+        create_task: Callable[[typing.Coroutine], asyncio.Task] = asyncio.create_task,
+    ) -> asyncio.Task:
+        key = _cache_key(func, kwargs)
+        if key is not _UNHASHABLE:
+            task = self._results.get(key)
+            if task is not None:
+                self.hits += 1
+                return task
+
+        self.misses += 1
+        task = create_task(func(**kwargs))
+        if key is not _UNHASHABLE:
+            self._results[key] = task
+        return task
+
+    def clear(self) -> None:
+        self._results.clear()
+
+
+def get_request_cache() -> Optional[RequestResultCache]:
+    return current_request_cache.get(None)
+
+
+@contextmanager
+def request_cache_context():
+    cache = get_request_cache()
+    if cache is not None:
+        yield cache
+        return
+
+    cache = RequestResultCache()
+    token = current_request_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        current_request_cache.reset(token)
+
+
+def _cache_key(func: Callable[..., Any], kwargs: Mapping[str, Any]) -> Hashable:
+    try:
+        key = (func, _freeze(kwargs))
+        hash(key)
+    except TypeError:
+        return _UNHASHABLE
+    return key
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, Mapping):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    return value
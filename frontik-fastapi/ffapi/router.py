@@ -1,14 +1,18 @@
 import asyncio
 import importlib
 import pkgutil
+import re
 from functools import wraps
-from typing import Callable, Any, Tuple
+from typing import Callable, Any, Optional, Tuple
 
 from fastapi import FastAPI
-from fastapi.routing import APIRoute
+from fastapi.dependencies.models import Dependant
+from fastapi.routing import APIRoute, get_request_handler
 from frontik.handler import PageHandler
 
+from ffapi.dispatch import route_static_segments, TrieDispatcher
 from ffapi.handler import frontik_asgi_handler
+from ffapi.planner import planned_endpoint
 
 
 class FrontikFastAPIRoute(APIRoute):
@@ -20,18 +24,59 @@ class FrontikFastAPIRoute(APIRoute):
 
         super().__init__(path, endpoint=endpoint_wrapper, **kwargs)
 
+    def get_route_handler(self):
+        # зависимости решаются планировщиком: async_dep запускаются, как только готовы их входы,
+        # а fastapi достаются только request, background_tasks и response
+        planned_dependant = Dependant(
+            call=planned_endpoint(self.dependant, self.body_field, self.dependency_overrides_provider),
+            request_param_name="request",
+            background_tasks_param_name="background_tasks",
+            response_param_name="response",
+            path=self.path_format,
+        )
+        return get_request_handler(
+            dependant=planned_dependant,
+            body_field=self.body_field,
+            status_code=self.status_code,
+            response_class=self.response_class,
+            response_field=self.secure_cloned_response_field,
+            response_model_include=self.response_model_include,
+            response_model_exclude=self.response_model_exclude,
+            response_model_by_alias=self.response_model_by_alias,
+            response_model_exclude_unset=self.response_model_exclude_unset,
+            response_model_exclude_defaults=self.response_model_exclude_defaults,
+            response_model_exclude_none=self.response_model_exclude_none,
+            dependency_overrides_provider=self.dependency_overrides_provider,
+        )
 
-def frontik_handlers(fastapi_app: FastAPI):
-    return [frontik_handler(fastapi_app, router) for router in fastapi_app.routes]
 
+def frontik_handlers(fastapi_app: FastAPI, request_timeout: Optional[float] = None):
+    return [frontik_handler(fastapi_app, router, request_timeout) for router in fastapi_app.routes]
 
-def frontik_handler(fastapi_app: FastAPI, router: FrontikFastAPIRoute) -> Tuple[str, PageHandler]:
+
+def frontik_handler(
+    fastapi_app: FastAPI, router: FrontikFastAPIRoute, request_timeout: Optional[float] = None
+) -> Tuple[str, PageHandler]:
     return (
         router.path_regex.pattern.replace("$", ".*"),
-        frontik_asgi_handler(fastapi_app),
+        frontik_asgi_handler(fastapi_app, request_timeout),
     )
 
 
+def frontik_prefix_handlers(fastapi_app: FastAPI, request_timeout: Optional[float] = None):
+    # один общий обработчик на первый статический сегмент пути, маршрут внутри выбирается через префиксное дерево
+    handler = frontik_asgi_handler(TrieDispatcher(fastapi_app), request_timeout)
+    prefixes = []
+    for route in fastapi_app.routes:
+        segments = route_static_segments(route)
+        if not segments:
+            return [("^/.*", handler)]
+        if segments[0] not in prefixes:
+            prefixes.append(segments[0])
+
+    return [(f"^/{re.escape(prefix)}(?:/.*)?$", handler) for prefix in prefixes]
+
+
 def import_app_routes(application: FastAPI, search_module, search_field: str = "app_router"):
     _try_add_router(application, search_field, search_module)
     for _, module, __ in pkgutil.walk_packages(search_module.__path__, prefix=f"{search_module.__package__}."):
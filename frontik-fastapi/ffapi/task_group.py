@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import typing
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+current_task_group = ContextVar("_current_task_group")
+
+T = typing.TypeVar("T")
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    pass
+
+
+class DependencyTaskGroup:
+    def __init__(self, timeout: Optional[float] = None) -> None:
+        self._loop = asyncio.get_running_loop()
+        self.deadline = self._loop.time() + timeout if timeout is not None else None
+        self.failure: Optional[BaseException] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._closed = False
+
+    def remaining_time(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return self.deadline - self._loop.time()
+
+    def create_task(self, coro: typing.Coroutine[Any, Any, T]) -> "asyncio.Task[T]":
+        if self._closed:
+            coro.close()
+            raise RuntimeError("Task group is already closed")
+
+        task = asyncio.create_task(self._run(coro))
+        self._tasks.add(task)
+        task.add_done_callback(self._on_done)
+        return task
+
+    def cancel(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+
+    async def close(self) -> None:
+        self._closed = True
+        tasks = list(self._tasks)
+        self.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, coro: typing.Coroutine[Any, Any, T]) -> T:
+        remaining = self.remaining_time()
+        if remaining is None:
+            return await coro
+        if remaining <= 0:
+            coro.close()
+            raise DeadlineExceeded("Request deadline exceeded")
+        try:
+            return await asyncio.wait_for(coro, remaining)
+        except asyncio.TimeoutError:
+            if self.remaining_time() <= 0:
+                raise DeadlineExceeded("Request deadline exceeded") from None
+            raise
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if task.cancelled() or task.exception() is None or self.failure is not None:
+            return
+
+        # первая ошибка отменяет остальные задачи запроса, их результат уже никому не нужен
+        self.failure = task.exception()
+        logger.debug("dependency task failed, cancelling %d sibling tasks", len(self._tasks))
+        self.cancel()
+
+
+def get_task_group() -> Optional[DependencyTaskGroup]:
+    return current_task_group.get(None)
+
+
+def get_remaining_time() -> Optional[float]:
+    task_group = get_task_group()
+    return task_group.remaining_time() if task_group is not None else None
+
+
+def create_task(coro: typing.Coroutine[Any, Any, T]) -> "asyncio.Task[T]":
+    task_group = get_task_group()
+    if task_group is None:
+        return asyncio.create_task(coro)
+    return task_group.create_task(coro)
+
+
+@asynccontextmanager
+async def task_group_context(timeout: Optional[float] = None):
+    task_group = get_task_group()
+    token = None
+    if task_group is None:
+        task_group = DependencyTaskGroup(timeout)
+        token = current_task_group.set(task_group)
+
+    try:
+        yield task_group
+    except BaseException as e:
+        # задачи отменяются только при ошибке: после успешного выхода их результат еще может понадобиться
+        # телу StreamingResponse или фоновой задаче
+        if token is not None:
+            await task_group.close()
+        # задачу запроса отменили не снаружи, а из-за упавшей зависимости
+        if isinstance(e, asyncio.CancelledError) and task_group.failure is not None:
+            raise task_group.failure from None
+        raise
+    finally:
+        if token is not None:
+            current_task_group.reset(token)
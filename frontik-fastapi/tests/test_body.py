@@ -0,0 +1,75 @@
+import pytest
+from fastapi import Body, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel
+
+from ffapi.dep import build_dep
+from tests.utils import asgi_client, make_apps, request_both
+
+
+class Item(BaseModel):
+    id: int
+
+
+def item_id(item: Item) -> int:
+    return item.id
+
+
+def raw_body(payload: bytes = Body()) -> bytes:
+    return payload
+
+
+def no_body() -> str:
+    return "ok"
+
+
+def make_request(body: bytes, content_type: str = "application/json") -> Request:
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        raise AssertionError("body is read twice")
+
+    scope = {"type": "http", "query_string": b"", "headers": [(b"content-type", content_type.encode())]}
+    return Request(scope, receive)
+
+
+async def test_build_dep_parses_body_only_when_needed():
+    request = make_request(b'{"id": 5}')
+    assert await build_dep(no_body, request) == "ok"
+    assert "ffapi.parsed_body" not in request.scope
+    assert await build_dep(item_id, request) == 5
+    # разобранное тело лежит в scope и переиспользуется без повторного чтения
+    assert await build_dep(item_id, Request(request.scope)) == 5
+
+    assert await build_dep(raw_body, make_request(b"raw", "text/plain")) == b"raw"
+
+    with pytest.raises(RequestValidationError):
+        await build_dep(item_id, make_request(b"{"))
+
+
+async def test_route_body_parity():
+    def add_routes(router):
+        @router.post("/items")
+        async def create_item(item: Item, request: Request):
+            return {"item": item.id, "built": await build_dep(item_id, request)}
+
+        @router.post("/raw")
+        async def post_raw(payload: bytes = Body()):
+            return len(payload)
+
+    planned, plain = make_apps(add_routes)
+    json_response = await request_both(planned, plain, "POST", "/items", json={"id": 1})
+    assert json_response.json() == {"item": 1, "built": 1}
+    await request_both(planned, plain, "POST", "/items", content=b"{", headers={"content-type": "application/json"})
+    await request_both(planned, plain, "POST", "/items", content=b'{"id": 1}', headers={"content-type": "text/plain"})
+    await request_both(planned, plain, "POST", "/items")
+    raw_response = await request_both(
+        planned, plain, "POST", "/raw", content=b"abc", headers={"content-type": "text/plain"}
+    )
+    assert raw_response.json() == 3
+
+    async with asgi_client(planned) as client:
+        response = await client.post("/items", json={"id": "x"})
+    assert response.status_code == 422
@@ -0,0 +1,96 @@
+import re
+
+import pytest
+from fastapi import APIRouter, FastAPI
+
+from ffapi.dispatch import RouteTrie, TrieDispatcher
+from ffapi.router import FrontikFastAPIRoute, frontik_prefix_handlers
+from tests.utils import asgi_client
+
+router = APIRouter(route_class=FrontikFastAPIRoute)
+
+
+@router.get("/users/{user_id}")
+async def get_user(user_id: int):
+    return {"user": user_id}
+
+
+@router.get("/users/me")
+async def get_me():
+    return "me"
+
+
+@router.post("/users")
+async def create_user():
+    return "created"
+
+
+@router.get("/users/{user_id}/resumes/{resume_id:path}")
+async def get_resume(user_id: int, resume_id: str):
+    return [user_id, resume_id]
+
+
+@router.get("/{page}")
+async def get_page(page: str):
+    return page
+
+
+@router.get("/api/v2/items/")
+async def get_items():
+    return "items"
+
+
+app = FastAPI()
+app.include_router(router)
+
+PATHS = [
+    ("GET", "/users/1"),
+    ("GET", "/users/me"),
+    ("GET", "/users/x"),
+    ("POST", "/users"),
+    ("GET", "/users"),
+    ("DELETE", "/users/1"),
+    ("GET", "/users/1/resumes/a/b/c"),
+    ("GET", "/about"),
+    ("GET", "/api/v2/items/"),
+    ("GET", "/api/v2/items"),
+    ("GET", "/api/v2/other"),
+    ("GET", "/"),
+]
+
+
+@pytest.mark.parametrize("method, path", PATHS)
+async def test_trie_dispatch_matches_router(method, path):
+    async with asgi_client(app) as client:
+        expected = await client.request(method, path)
+    async with asgi_client(TrieDispatcher(app)) as client:
+        response = await client.request(method, path)
+
+    assert response.status_code == expected.status_code
+    assert response.headers.get("location") == expected.headers.get("location")
+    assert response.content == expected.content
+
+
+def test_route_trie_candidates():
+    trie = RouteTrie(app.routes)
+    # маршруты без статического префикса проверяются для любого пути, порядок регистрации сохраняется
+    paths = [route.path for route in trie.candidates("/users/1")]
+    assert paths == [route.path for route in app.routes if route.path in set(paths)]
+    assert "/{page}" in paths and "/api/v2/items/" not in paths
+
+
+def test_prefix_handlers():
+    prefix_app = FastAPI()
+    prefix_router = APIRouter(route_class=FrontikFastAPIRoute)
+    prefix_router.add_api_route("/api/items", get_items)
+    prefix_router.add_api_route("/v1.0/users", get_me)
+    prefix_app.include_router(prefix_router)
+    patterns = [pattern for pattern, _ in frontik_prefix_handlers(prefix_app)]
+
+    def matches(path: str) -> bool:
+        return any(re.match(pattern, path) for pattern in patterns)
+
+    assert matches("/api") and matches("/api/items") and matches("/v1.0/users")
+    assert not matches("/apiv2") and not matches("/v1x0/users")
+
+    assert [pattern for pattern, _ in frontik_prefix_handlers(app)] == ["^/.*"]
@@ -0,0 +1,111 @@
+import asyncio
+from typing import List, Optional
+
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.responses import StreamingResponse
+from tornado.httputil import HTTPHeaders, HTTPServerRequest
+
+from ffapi.dep import async_dep
+from ffapi.handler import frontik_asgi_handler
+from ffapi.router import FrontikFastAPIRoute
+
+cancelled: List[str] = []
+
+
+async def wait_forever() -> None:
+    try:
+        await asyncio.sleep(10)
+    except asyncio.CancelledError:
+        cancelled.append("wait_forever")
+        raise
+
+
+router = APIRouter(route_class=FrontikFastAPIRoute)
+
+
+@router.post("/echo")
+async def echo(request: Request):
+    return {"body": (await request.body()).decode(), "name": request.headers["x-name"]}
+
+
+@router.get("/stream")
+async def stream():
+    async def body():
+        for chunk in (b"a", b"b", b"c"):
+            yield chunk
+
+    return StreamingResponse(body(), headers={"x-name": "café"})
+
+
+@router.get("/endless")
+async def endless(task=async_dep(wait_forever)):
+    async def body():
+        while True:
+            yield b"chunk"
+            await asyncio.sleep(0.001)
+
+    return StreamingResponse(body())
+
+
+app = FastAPI()
+app.include_router(router)
+
+
+class RecordingHandler(frontik_asgi_handler(app)):
+    def __init__(self, request: HTTPServerRequest) -> None:
+        self.request = request
+        self.status: Optional[int] = None
+        self.headers = {}
+        self.chunks: List[bytes] = []
+        self.flushes = 0
+
+    def set_status(self, status_code, reason=None):
+        self.status = status_code
+
+    def clear_header(self, name):
+        self.headers.pop(name, None)
+
+    def add_header(self, name, value):
+        self.headers[name] = value
+
+    def write(self, chunk):
+        self.chunks.append(chunk)
+
+    async def flush(self, include_footers=False):
+        self.flushes += 1
+
+
+def make_handler(method: str, uri: str, body: bytes = b"", **headers) -> RecordingHandler:
+    request = HTTPServerRequest(method=method, uri=uri, version="HTTP/1.1", headers=HTTPHeaders(headers), body=body)
+    return RecordingHandler(request)
+
+
+async def test_request_body_and_headers():
+    # tornado отдает заголовки строками, декодированными из latin-1
+    handler = make_handler("POST", "/echo", b"hello", **{"x-name": "café"})
+    await handler.post()
+    assert handler.status == 200
+    assert b"".join(handler.chunks) == '{"body":"hello","name":"café"}'.encode()
+
+
+async def test_streaming_response():
+    handler = make_handler("GET", "/stream")
+    await handler.get()
+    assert handler.status == 200
+    assert handler.chunks == [b"a", b"b", b"c"]
+    assert handler.flushes == 3
+    assert handler.headers["x-name"] == "café"
+
+
+async def test_disconnect():
+    handler = make_handler("GET", "/endless")
+    task = asyncio.create_task(handler.get())
+    while len(handler.chunks) < 2:
+        await asyncio.sleep(0.001)
+    handler.on_connection_close()
+    await asyncio.wait_for(task, 1)
+
+    written = len(handler.chunks)
+    await asyncio.sleep(0.01)
+    assert len(handler.chunks) == written
+    assert cancelled == ["wait_forever"]
@@ -0,0 +1,73 @@
+import asyncio
+from typing import List
+
+from fastapi import Depends, FastAPI
+
+from ffapi.dep import async_dep, DepBuilder
+from ffapi.deptest import override_dependency
+from ffapi.planner import get_call_plan, get_plan_timings
+from tests.utils import asgi_client, make_apps
+
+
+async def fast_dep() -> int:
+    return 1
+
+
+async def slow_dep(value: int = Depends(fast_dep)) -> int:
+    await asyncio.sleep(0.02)
+    return value + 1
+
+
+async def fetch_data() -> int:
+    await asyncio.sleep(0.01)
+    return 3
+
+
+def with_scopes(app: FastAPI, scopes: List[dict]):
+    async def asgi_app(scope, receive, send):
+        scopes.append(scope)
+        await app(scope, receive, send)
+
+    return asgi_app
+
+
+async def test_plan_timings():
+    def add_routes(router):
+        @router.get("/timings")
+        async def get_timings(slow: int = Depends(slow_dep), data=async_dep(fetch_data)):
+            return slow + await data
+
+    planned, _ = make_apps(add_routes)
+    scopes: List[dict] = []
+    async with asgi_client(with_scopes(planned, scopes)) as client:
+        assert (await client.get("/timings")).json() == 5
+
+    timings = get_plan_timings(scopes[0])
+    assert [node.name for node in timings.critical_path()][-3:] == [
+        "fast_dep",
+        "slow_dep",
+        "test_plan_timings.<locals>.add_routes.<locals>.get_timings",
+    ]
+    slow = timings.critical_path()[-2]
+    assert slow.duration >= 0.02
+    assert timings.critical_path_duration >= 0.02
+    assert "slow_dep" in timings.format_critical_path()
+    fetch = next(node for node in timings.nodes if node.name == "fetch_data")
+    # async_dep запускается раньше slow_dep и идет параллельно с ним
+    assert fetch.start < slow.start + 0.01 and fetch.duration >= 0.01
+
+
+async def test_call_plan_cache():
+    def build_value(value: int = Depends(slow_dep)) -> int:
+        return value
+
+    plan = get_call_plan(build_value)
+    assert get_call_plan(build_value) is plan
+    assert await DepBuilder(build_value).build() == 2
+
+    with override_dependency({fast_dep: 10}):
+        assert await DepBuilder(build_value).build() == 11
+    assert await DepBuilder(build_value).build() == 2
+    # override_dependency сбрасывает кэш планов
+    assert get_call_plan(build_value) is not plan
+    assert await DepBuilder(build_value).override(slow_dep, 5).build() == 5
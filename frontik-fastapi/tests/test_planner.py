@@ -0,0 +1,179 @@
+import asyncio
+from contextvars import ContextVar
+from typing import List
+
+from fastapi import Depends, HTTPException, Query
+from pydantic import BaseModel
+
+from ffapi.dep import async_dep
+from tests.utils import asgi_client, make_apps, request_both
+
+current_user = ContextVar("current_user", default=None)
+
+
+class Item(BaseModel):
+    id: int
+    name: str
+
+
+async def test_validation_errors():
+    async def page(limit: int = Query()) -> int:
+        return limit
+
+    def add_routes(router):
+        @router.post("/items")
+        async def create_item(item: Item, page_limit: int = Depends(page), flag: bool = Query(False)):
+            return {"item": item.id, "limit": page_limit, "flag": flag}
+
+    planned, plain = make_apps(add_routes)
+    response = await request_both(planned, plain, "POST", "/items?limit=10", json={"id": 1, "name": "a"})
+    assert response.json() == {"item": 1, "limit": 10, "flag": False}
+
+    response = await request_both(planned, plain, "POST", "/items?limit=x&flag=maybe", json={"id": "y"})
+    assert response.status_code == 422
+    assert len(response.json()["detail"]) == 4
+
+    response = await request_both(
+        planned, plain, "POST", "/items?limit=1", content=b"{", headers={"content-type": "application/json"}
+    )
+    assert response.status_code == 422
+
+
+async def test_dependency_overrides():
+    async def real_user() -> str:
+        return "real"
+
+    async def greeting(user: str = Depends(real_user)) -> str:
+        return f"hello {user}"
+
+    def add_routes(router):
+        @router.get("/greeting")
+        async def get_greeting(text: str = Depends(greeting)):
+            return text
+
+    planned, plain = make_apps(add_routes)
+    for app in (planned, plain):
+        app.dependency_overrides[real_user] = lambda: "override"
+    assert (await request_both(planned, plain, "GET", "/greeting")).json() == "hello override"
+
+    for app in (planned, plain):
+        app.dependency_overrides.clear()
+    assert (await request_both(planned, plain, "GET", "/greeting")).json() == "hello real"
+
+
+async def test_generator_dependencies():
+    events: List[str] = []
+
+    async def user_context(user: str = Query("anonymous")):
+        token = current_user.set(user)
+        events.append("enter")
+        try:
+            yield user
+        finally:
+            # reset падает, если teardown выполняется в другом контексте
+            current_user.reset(token)
+            events.append("exit")
+
+    def session():
+        events.append("session")
+        yield "session"
+        events.append("session closed")
+
+    def add_routes(router):
+        @router.get("/user")
+        async def get_user(user: str = Depends(user_context), db: str = Depends(session)):
+            return {"user": user, "current": current_user.get(), "db": db}
+
+    planned, plain = make_apps(add_routes)
+    response = await request_both(planned, plain, "GET", "/user?user=bob")
+    assert response.json() == {"user": "bob", "current": "bob", "db": "session"}
+    assert events == ["enter", "session", "session closed", "exit"] * 2
+
+
+async def test_use_cache():
+    calls: List[str] = []
+
+    async def counter() -> int:
+        calls.append("counter")
+        return 1
+
+    async def cached(value: int = Depends(counter)) -> int:
+        return value
+
+    async def uncached(value: int = Depends(counter, use_cache=False)) -> int:
+        return value
+
+    def add_routes(router):
+        @router.get("/cache")
+        async def get_cache(a: int = Depends(counter), b: int = Depends(cached), c: int = Depends(uncached)):
+            return [a, b, c]
+
+    planned, plain = make_apps(add_routes)
+    assert (await request_both(planned, plain, "GET", "/cache")).json() == [1, 1, 1]
+    # один вызов на кэш запроса и один для use_cache=False, на каждое приложение
+    assert len(calls) == 4
+
+
+async def test_route_dependencies_run_first():
+    side_effects: List[str] = []
+    fetched: List[str] = []
+
+    async def guard(token: str = Query("")) -> None:
+        if token != "secret":
+            raise HTTPException(401)
+
+    async def write_audit() -> None:
+        side_effects.append("audit")
+
+    async def fetch_data() -> str:
+        fetched.append("data")
+        return "data"
+
+    def add_routes(router):
+        @router.get("/private", dependencies=[Depends(guard)])
+        async def get_private(audit: None = Depends(write_audit), data=async_dep(fetch_data)):
+            return await data
+
+    planned, plain = make_apps(add_routes)
+    response = await request_both(planned, plain, "GET", "/private")
+    assert response.status_code == 401
+    assert side_effects == [] and fetched == []
+
+    response = await request_both(planned, plain, "GET", "/private?token=secret")
+    assert response.json() == "data"
+    assert side_effects == ["audit"] * 2
+
+
+async def test_context_vars_in_endpoint():
+    async def authenticate(user: str = Query()) -> None:
+        current_user.set(user)
+
+    def add_routes(router):
+        @router.get("/me", dependencies=[Depends(authenticate)])
+        async def get_me():
+            return current_user.get()
+
+    planned, plain = make_apps(add_routes)
+    assert (await request_both(planned, plain, "GET", "/me?user=alice")).json() == "alice"
+
+
+async def test_async_dep_starts_before_slow_dependencies():
+    events: List[str] = []
+
+    async def slow() -> None:
+        await asyncio.sleep(0.01)
+        events.append("slow")
+
+    async def fetch() -> int:
+        events.append("fetch")
+        return 1
+
+    def add_routes(router):
+        @router.get("/data")
+        async def get_data(_: None = Depends(slow), value=async_dep(fetch)):
+            return await value
+
+    planned, _ = make_apps(add_routes)
+    async with asgi_client(planned) as client:
+        assert (await client.get("/data")).json() == 1
+    assert events == ["fetch", "slow"]
@@ -0,0 +1,72 @@
+from typing import List
+
+from fastapi import Query, Request
+
+from ffapi.dep import async_dep, build_dep
+from ffapi.request_cache import get_request_cache, RequestResultCache
+from tests.utils import asgi_client, make_apps
+
+
+async def test_async_dep_results_are_shared_within_request():
+    calls: List[int] = []
+
+    async def fetch_user(user_id: int = Query()) -> dict:
+        calls.append(user_id)
+        return {"id": user_id}
+
+    async def fetch_name(user=async_dep(fetch_user)) -> str:
+        return f"user {(await user)['id']}"
+
+    def user_task(user=async_dep(fetch_user)):
+        return user
+
+    def add_routes(router):
+        @router.get("/user")
+        async def get_user(request: Request, user=async_dep(fetch_user), name=async_dep(fetch_name)):
+            built = await build_dep(user_task, request)
+            cache = get_request_cache()
+            return {"user": await user, "name": await name, "built": await built, "misses": cache.misses}
+
+    planned, _ = make_apps(add_routes)
+    async with asgi_client(planned) as client:
+        assert (await client.get("/user?user_id=1")).json() == {
+            "user": {"id": 1},
+            "name": "user 1",
+            "built": {"id": 1},
+            "misses": 2,
+        }
+        assert calls == [1]
+
+        await client.get("/user?user_id=2")
+        assert calls == [1, 2]
+
+
+def test_cache_keys():
+    class TaskFactory:
+        def __init__(self) -> None:
+            self.started = 0
+
+        def __call__(self, coro):
+            self.started += 1
+            coro.close()
+            return object()
+
+    class Unhashable:
+        __hash__ = None
+
+    async def fetch(ids):
+        return ids
+
+    cache = RequestResultCache()
+    create_task = TaskFactory()
+    first = cache.get_or_start(fetch, {"ids": (1, 2)}, create_task)
+    # списки и словари в аргументах приводятся к hashable виду
+    assert cache.get_or_start(fetch, {"ids": [1, 2]}, create_task) is first
+    nested = cache.get_or_start(fetch, {"ids": {"a": [1, {2}]}}, create_task)
+    assert cache.get_or_start(fetch, {"ids": {"a": [1, {2}]}}, create_task) is nested
+
+    unhashable = Unhashable()
+    assert cache.get_or_start(fetch, {"ids": unhashable}, create_task) is not cache.get_or_start(
+        fetch, {"ids": unhashable}, create_task
+    )
+    assert (cache.hits, cache.misses, create_task.started) == (2, 4, 4)
@@ -0,0 +1,100 @@
+import asyncio
+from typing import List
+
+import pytest
+from fastapi import BackgroundTasks
+from fastapi.responses import StreamingResponse
+
+from ffapi.dep import async_dep
+from ffapi.task_group import DeadlineExceeded, task_group_context
+from tests.utils import asgi_client, make_apps
+
+
+async def fetch_slow() -> str:
+    await asyncio.sleep(0.01)
+    return "slow"
+
+
+def with_deadline(app, timeout: float):
+    # так группу с таймаутом создает AsgiHandler
+    async def asgi_app(scope, receive, send):
+        async with task_group_context(timeout):
+            await app(scope, receive, send)
+
+    return asgi_app
+
+
+async def test_streaming_response_uses_async_dep():
+    def add_routes(router):
+        @router.get("/stream")
+        async def get_stream(value=async_dep(fetch_slow)):
+            async def body():
+                yield b"value: "
+                yield (await value).encode()
+
+            return StreamingResponse(body())
+
+    planned, _ = make_apps(add_routes)
+    async with asgi_client(planned) as client:
+        response = await client.get("/stream")
+    assert response.status_code == 200
+    assert response.content == b"value: slow"
+
+
+async def test_background_task_uses_async_dep():
+    results: List[str] = []
+
+    async def save(value: asyncio.Task) -> None:
+        results.append(await value)
+
+    def add_routes(router):
+        @router.get("/background")
+        async def get_background(background_tasks: BackgroundTasks, value=async_dep(fetch_slow)):
+            background_tasks.add_task(save, value)
+            return "ok"
+
+    planned, _ = make_apps(add_routes)
+    async with asgi_client(planned) as client:
+        assert (await client.get("/background")).json() == "ok"
+    assert results == ["slow"]
+
+
+async def test_failed_dependency_cancels_siblings():
+    cancelled: List[str] = []
+
+    async def fail() -> None:
+        await asyncio.sleep(0.001)
+        raise ValueError("upstream failed")
+
+    async def wait_long() -> None:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append("wait_long")
+            raise
+
+    def add_routes(router):
+        @router.get("/fail")
+        async def get_fail(long=async_dep(wait_long), failing=async_dep(fail)):
+            await long
+
+    planned, _ = make_apps(add_routes)
+    async with asgi_client(planned) as client:
+        with pytest.raises(ValueError, match="upstream failed"):
+            await client.get("/fail")
+    assert cancelled == ["wait_long"]
+
+
+async def test_deadline():
+    def add_routes(router):
+        @router.get("/slow")
+        async def get_slow(value=async_dep(fetch_slow)):
+            return await value
+
+    planned, _ = make_apps(add_routes)
+    async with asgi_client(with_deadline(planned, 0.001)) as client:
+        with pytest.raises(DeadlineExceeded):
+            await client.get("/slow")
+
+    async with asgi_client(with_deadline(planned, 1)) as client:
+        assert (await client.get("/slow")).json() == "slow"
@@ -0,0 +1,35 @@
+from typing import Callable, Tuple
+
+import httpx
+from fastapi import APIRouter, FastAPI
+from fastapi.routing import APIRoute
+
+from ffapi.router import FrontikFastAPIRoute
+
+
+def make_apps(add_routes: Callable[[APIRouter], None]) -> Tuple[FastAPI, FastAPI]:
+    """
+    Одни и те же маршруты через планировщик и на обычном fastapi, для сравнения поведения
+    """
+    apps = []
+    for route_class in (FrontikFastAPIRoute, APIRoute):
+        app = FastAPI()
+        router = APIRouter(route_class=route_class)
+        add_routes(router)
+        app.include_router(router)
+        apps.append(app)
+    return apps[0], apps[1]
+
+
+def asgi_client(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+async def request_both(planned: FastAPI, plain: FastAPI, method: str, url: str, **kwargs) -> httpx.Response:
+    async with asgi_client(planned) as client:
+        planned_response = await client.request(method, url, **kwargs)
+    async with asgi_client(plain) as client:
+        plain_response = await client.request(method, url, **kwargs)
+    assert planned_response.status_code == plain_response.status_code
+    assert planned_response.content == plain_response.content
+    return planned_response